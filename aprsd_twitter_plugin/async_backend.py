@@ -0,0 +1,136 @@
+"""Optional asyncio posting backend.
+
+Tweets are posted from one event loop running in its own thread with
+tweepy's AsyncClient, so many posts can be in flight over a single
+aiohttp connection pool without tying up the packet thread.  This needs
+the ``async`` extra (``pip install aprsd-twitter-plugin[async]``).
+"""
+
+import asyncio
+import logging
+
+import tweepy
+from aprsd.threads import APRSDThread
+
+LOG = logging.getLogger("APRSD")
+
+try:
+    import aiohttp
+    from tweepy.asynchronous import AsyncClient
+except (ImportError, tweepy.TweepyException):
+    aiohttp = None
+    AsyncClient = None
+
+
+def available():
+    """Is tweepy's async client usable in this environment?"""
+    return AsyncClient is not None
+
+
+class AsyncPostThread(APRSDThread):
+    """Run the event loop that posts tweets.
+
+    ``submit()`` is safe to call from any thread.  At most
+    ``max_concurrency`` posts run at once and each one is abandoned
+    after ``timeout`` seconds.  On stop, posts still in flight get up to
+    ``drain_timeout`` seconds (default ``timeout``) to finish, the rest
+    are cancelled and their callback gets an asyncio.CancelledError.
+    ``client`` replaces the AsyncClient, which is only useful for tests
+    and benchmarks.
+    """
+
+    def __init__(
+        self,
+        consumer_key=None,
+        consumer_secret=None,
+        access_token=None,
+        access_token_secret=None,
+        max_concurrency=8,
+        timeout=30,
+        client=None,
+        drain_timeout=None,
+    ):
+        super().__init__("TwitterAsyncPost")
+        self.credentials = {
+            "consumer_key": consumer_key,
+            "consumer_secret": consumer_secret,
+            "access_token": access_token,
+            "access_token_secret": access_token_secret,
+        }
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.drain_timeout = timeout if drain_timeout is None else drain_timeout
+        self.client = client
+        self.session = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = asyncio.Event()
+        self._stopped = asyncio.Event()
+        self._sem = asyncio.Semaphore(max_concurrency)
+
+    async def _open(self):
+        if self.client is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self.session = aiohttp.ClientSession(connector=connector)
+            self.client = AsyncClient(**self.credentials)
+            self.client.session = self.session
+        self._ready.set()
+
+    async def _close(self):
+        tasks = [t for t in asyncio.all_tasks(self._loop) if t is not asyncio.current_task()]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=self.drain_timeout)
+            if pending:
+                LOG.warning(f"Cancelling {len(pending)} tweets still being posted")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if self.session:
+            await self.session.close()
+
+    async def _post(self, text, callback):
+        tweet_id = None
+        error = None
+        try:
+            await self._ready.wait()
+            async with self._sem:
+                response = await asyncio.wait_for(
+                    self.client.create_tweet(text=text),
+                    self.timeout,
+                )
+            tweet_id = response.data["id"]
+        except (Exception, asyncio.CancelledError) as ex:
+            # CancelledError means we are shutting down, still tell the
+            # callback so the sender gets an answer.
+            error = ex
+
+        if callback:
+            # The callback may block (sending an APRS reply for example),
+            # so keep it off the event loop.
+            await self._loop.run_in_executor(None, callback, tweet_id, error)
+        if error:
+            raise error
+        return tweet_id
+
+    def submit(self, text, callback=None):
+        """Queue a tweet, returning a concurrent.futures.Future for its id.
+
+        ``callback(tweet_id, error)`` is called from a worker thread once
+        the post finished, exactly one of the two is None.
+        """
+        return asyncio.run_coroutine_threadsafe(self._post(text, callback), self._loop)
+
+    def stop(self):
+        super().stop()
+        if not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+    def loop(self):
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._open())
+            self._loop.run_until_complete(self._stopped.wait())
+            self._loop.run_until_complete(self._close())
+        finally:
+            self._loop.run_until_complete(self._loop.shutdown_default_executor())
+            self._loop.close()
+        return False
@@ -0,0 +1,223 @@
+"""Structured audit log of every tweet request and its outcome.
+
+The packet thread only puts a record on a queue; a writer thread appends
+batches of JSON lines to the current segment.  Segments are rotated by
+size and age, and closed segments are gzipped.  Segment names carry the
+UTC time of their first record, so queries skip segments outside the
+requested date range and stream the rest line by line.
+"""
+
+import datetime
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import time
+
+from aprsd.threads import APRSDThread
+
+LOG = logging.getLogger("APRSD")
+
+DEFAULT_AUDIT_DIR = os.path.join(os.path.expanduser("~"), ".config", "aprsd", "twitter_audit")
+
+SEGMENT_REGEX = re.compile(r"^audit-(?P<start>\d{8}T\d{6}\.\d{6})Z\.jsonl(?P<gz>\.gz)?$")
+TIME_FORMAT = "%Y%m%dT%H%M%S.%f"
+
+
+def _segment_start(filename):
+    match = SEGMENT_REGEX.match(filename)
+    if not match:
+        return None
+    start = datetime.datetime.strptime(match.group("start"), TIME_FORMAT)
+    return start.replace(tzinfo=datetime.UTC).timestamp()
+
+
+def _compress(path):
+    """gzip a closed segment, removing the plain file."""
+    tmp = f"{path}.gz.tmp"
+    with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.replace(tmp, f"{path}.gz")
+    os.remove(path)
+
+
+class AuditLog(APRSDThread):
+    """Write audit records off the packet thread.
+
+    A segment is closed once it is ``max_bytes`` big or ``max_age``
+    seconds old.  Records wait at most ``flush_interval`` seconds before
+    they are written, in batches of up to ``batch_size``.
+    """
+
+    def __init__(
+        self,
+        directory,
+        max_bytes=10 * 1024 * 1024,
+        max_age=86400,
+        flush_interval=1.0,
+        batch_size=100,
+        max_queue=10000,
+    ):
+        os.makedirs(directory, exist_ok=True)
+        super().__init__("TwitterAudit")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._fh = None
+        self._path = None
+        self._opened = 0.0
+        self._size = 0
+        self._recovered = False
+
+    def record(self, callsign, msg_no, text, outcome, latency, tweet_id=None):
+        """Queue one audit record, never blocks."""
+        entry = {
+            "time": time.time(),
+            "callsign": callsign,
+            "msgNo": msg_no,
+            "text_sha256": hashlib.sha256((text or "").encode("utf-8")).hexdigest(),
+            "tweet_id": tweet_id,
+            "latency_ms": round(latency * 1000, 1),
+            "outcome": outcome,
+        }
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+            LOG.warning(f"Audit queue full, dropped record for {callsign} ({self.dropped} total)")
+
+    def _recover(self):
+        # Segments left open by a crash are complete as far as they go.
+        for path in glob.glob(os.path.join(self.directory, "audit-*.jsonl")):
+            try:
+                _compress(path)
+            except OSError as ex:
+                LOG.error(f"Can't compress audit segment {path}: {ex}")
+        self._recovered = True
+
+    def _open_segment(self, first):
+        if not self._recovered:
+            self._recover()
+        # Named after its first record, so every record in a segment is
+        # newer than its name and older than the next segment's name.
+        now = datetime.datetime.fromtimestamp(first, datetime.UTC)
+        self._path = os.path.join(self.directory, f"audit-{now.strftime(TIME_FORMAT)}Z.jsonl")
+        self._fh = open(self._path, "a", encoding="utf-8")
+        self._opened = time.monotonic()
+        self._size = 0
+
+    def _close_segment(self):
+        if self._fh is None:
+            return
+        self._fh.close()
+        self._fh = None
+        try:
+            _compress(self._path)
+        except OSError as ex:
+            LOG.error(f"Can't compress audit segment {self._path}: {ex}")
+
+    def _write(self, batch):
+        data = "".join(json.dumps(entry) + "\n" for entry in batch)
+        try:
+            if self._fh is None:
+                self._open_segment(batch[0]["time"])
+            self._fh.write(data)
+            self._fh.flush()
+        except OSError as ex:
+            LOG.error(f"Can't write {len(batch)} audit records: {ex}")
+            return
+        self._size += len(data)
+
+    def _maybe_rotate(self):
+        if self._fh is None:
+            return
+        if self._size >= self.max_bytes or time.monotonic() - self._opened >= self.max_age:
+            self._close_segment()
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def flush(self):
+        """Write everything queued so far, from the calling thread."""
+        batch = self._drain(self._queue.qsize() or 1)
+        if batch:
+            self._write(batch)
+
+    def loop(self):
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            pass
+        else:
+            self._write([first] + self._drain(self.batch_size - 1))
+        self._maybe_rotate()
+        return True
+
+    def _cleanup(self):
+        while not self._queue.empty():
+            self.flush()
+        self._close_segment()
+
+
+def segments(directory):
+    """Return [(start, path)] of the audit segments, oldest first."""
+    found = {}
+    for filename in os.listdir(directory):
+        start = _segment_start(filename)
+        if start is None:
+            continue
+        # while a segment is being compressed both files may exist
+        if filename.endswith(".gz") or start not in found:
+            found[start] = os.path.join(directory, filename)
+    return sorted(found.items())
+
+
+def query(directory, callsign=None, since=None, until=None):
+    """Yield audit records, oldest first, matching a callsign and time range.
+
+    ``since`` and ``until`` are epoch seconds, ``until`` is exclusive.
+    Segments are streamed, and skipped entirely when their time span
+    can't overlap the range.
+    """
+    found = segments(directory)
+    for index, (start, path) in enumerate(found):
+        end = found[index + 1][0] if index + 1 < len(found) else None
+        if until is not None and start >= until:
+            break
+        if since is not None and end is not None and end <= since:
+            continue
+
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            with opener(path, "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                        timestamp = entry["time"]
+                    except (ValueError, KeyError, TypeError):
+                        # a torn last line of the open segment
+                        continue
+                    if callsign and entry.get("callsign") != callsign:
+                        continue
+                    if since is not None and timestamp < since:
+                        continue
+                    if until is not None and timestamp >= until:
+                        continue
+                    yield entry
+        except (OSError, EOFError) as ex:
+            LOG.error(f"Can't read audit segment {path}: {ex}")
@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 """
-CLI tool for aprsd-twitter-plugin configuration export.
+CLI tool for aprsd-twitter-plugin configuration export, live stats and
+audit log queries.
 """
 
+import datetime
 import json
 import sys
+import time
 
 
 def export_config_cmd(format="json"):
@@ -30,12 +33,131 @@ def export_config_cmd(format="json"):
         return 1
 
 
+def _age(timestamp, now):
+    if not timestamp:
+        return "never"
+    return f"{now - timestamp:.0f}s ago"
+
+
+def format_stats(stats, now=None):
+    """Render a stats dict as the lines shown by 'stats' and 'top'."""
+    now = now or time.time()
+    reset = stats["rate_limit_reset"]
+    if reset > 0:
+        reset = datetime.datetime.fromtimestamp(reset, datetime.UTC).strftime("%H:%M:%SZ")
+    else:
+        reset = "unknown"
+    remaining = stats["rate_limit_remaining"]
+    return [
+        f"aprsd pid {stats['pid']}, updated {_age(stats['updated'], now)}",
+        f"tweets sent   {stats['sent']:>8}   failed  {stats['failed']:>8}",
+        f"retried       {stats['retried']:>8}   blocked {stats['blocked']:>8}",
+        f"queued        {max(stats['queue_depth'], 0):>8}   "
+        f"retrying {max(stats['retry_depth'], 0):>7}",
+        f"rate limit    {remaining if remaining >= 0 else 'unknown':>8}   reset {reset}",
+        "errors        "
+        + " ".join(
+            f"{name}={stats[name]}"
+            for name in ("transient", "rate_limit", "duplicate", "auth", "content", "unknown")
+        ),
+        f"last error    {stats['last_error'] or 'none'} ({_age(stats['last_error_time'], now)})",
+    ]
+
+
+def stats_cmd(path, as_json=False, interval=None):
+    """Print the live plugin stats, refreshing every interval seconds if set."""
+    from aprsd_twitter_plugin import stats
+
+    try:
+        reader = stats.StatsReader(path)
+    except (OSError, ValueError) as e:
+        print(f"Error: can't read stats file {path}: {e}", file=sys.stderr)
+        return 1
+
+    try:
+        while True:
+            current = reader.read()
+            if as_json:
+                print(json.dumps(current))
+            else:
+                if interval:
+                    # clear the screen like top does
+                    print("\033[H\033[2J", end="")
+                print("\n".join(format_stats(current)))
+            if not interval:
+                return 0
+            sys.stdout.flush()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return 0
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        reader.close()
+
+
+def parse_time(text, end=False):
+    """Parse an ISO date or datetime (UTC unless given) into epoch seconds.
+
+    A bare date as the ``end`` of a range means the end of that day.
+    """
+    value = datetime.datetime.fromisoformat(text)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=datetime.UTC)
+    if end and len(text) == 10:
+        value += datetime.timedelta(days=1)
+    return value.timestamp()
+
+
+def format_audit(entry):
+    when = datetime.datetime.fromtimestamp(entry["time"], datetime.UTC)
+    tweet = f" tweet {entry['tweet_id']}" if entry.get("tweet_id") else ""
+    return (
+        f"{when.strftime('%Y-%m-%d %H:%M:%SZ')} {entry.get('callsign')} "
+        f"msg {entry.get('msgNo')} {entry.get('outcome')}{tweet} "
+        f"{entry.get('latency_ms')}ms {entry.get('text_sha256', '')[:12]}"
+    )
+
+
+def audit_cmd(directory, callsign=None, since=None, until=None, as_json=False):
+    """Print the audit records matching a callsign and date range."""
+    from aprsd_twitter_plugin import audit
+
+    try:
+        since = parse_time(since) if since else None
+        until = parse_time(until, end=True) if until else None
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    try:
+        for entry in audit.query(
+            directory,
+            callsign=callsign.upper() if callsign else None,
+            since=since,
+            until=until,
+        ):
+            print(json.dumps(entry) if as_json else format_audit(entry))
+    except OSError as e:
+        print(f"Error: can't read audit log {directory}: {e}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # output piped to head
+        return 0
+    return 0
+
+
 def main():
     """Main entry point for CLI."""
     import argparse
 
+    from aprsd_twitter_plugin.audit import DEFAULT_AUDIT_DIR
+    from aprsd_twitter_plugin.stats import DEFAULT_STATS_FILE
+
     parser = argparse.ArgumentParser(
-        description="Export aprsd-twitter-plugin configuration options",
+        description="aprsd-twitter-plugin tools.  Without a command, export "
+        "the configuration options.",
     )
     parser.add_argument(
         "--format",
@@ -43,8 +165,71 @@ def main():
         default="json",
         help="Output format (default: json)",
     )
+    subparsers = parser.add_subparsers(dest="command")
+
+    export_parser = subparsers.add_parser(
+        "export-config",
+        help="Export plugin configuration options",
+    )
+    export_parser.add_argument(
+        "--format",
+        choices=["dict", "json"],
+        # keep a --format given before the command
+        default=argparse.SUPPRESS,
+        help="Output format (default: json)",
+    )
+
+    for name, help_text in (
+        ("stats", "Show the live plugin counters once"),
+        ("top", "Show the live plugin counters, refreshing"),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument(
+            "--file",
+            default=DEFAULT_STATS_FILE,
+            help=f"Stats file written by the plugin (default: {DEFAULT_STATS_FILE})",
+        )
+        sub.add_argument("--json", action="store_true", help="Print raw JSON")
+        if name == "top":
+            sub.add_argument(
+                "--interval",
+                type=float,
+                default=1.0,
+                help="Seconds between refreshes (default: 1)",
+            )
+
+    audit_parser = subparsers.add_parser("audit", help="Search the audit log")
+    audit_parser.add_argument(
+        "--dir",
+        default=DEFAULT_AUDIT_DIR,
+        help=f"Audit log directory (default: {DEFAULT_AUDIT_DIR})",
+    )
+    audit_parser.add_argument("--callsign", help="Only show requests from this callsign")
+    audit_parser.add_argument(
+        "--since",
+        help="Only show requests at or after this UTC date/time, ie. 2024-05-01",
+    )
+    audit_parser.add_argument(
+        "--until",
+        help="Only show requests before this UTC date/time (a date includes the whole day)",
+    )
+    audit_parser.add_argument("--json", action="store_true", help="Print raw JSON lines")
 
     args = parser.parse_args()
+    if args.command == "stats":
+        sys.exit(stats_cmd(args.file, as_json=args.json))
+    if args.command == "top":
+        sys.exit(stats_cmd(args.file, as_json=args.json, interval=args.interval))
+    if args.command == "audit":
+        sys.exit(
+            audit_cmd(
+                args.dir,
+                callsign=args.callsign,
+                since=args.since,
+                until=args.until,
+                as_json=args.json,
+            ),
+        )
     sys.exit(export_config_cmd(format=args.format))
 
 
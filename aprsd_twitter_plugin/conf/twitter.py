@@ -44,6 +44,228 @@ twitter_opts = [
         default=True,
         help="Automatically add #aprs hash tag to every tweet?",
     ),
+    cfg.BoolOpt(
+        "content_filter_enabled",
+        default=True,
+        help="Scan every tweet with the content filter before it is sent.",
+    ),
+    cfg.StrOpt(
+        "content_filter_blocklist",
+        help="Path to a file of blocked terms, one per line.  "
+        "Lines that are just # or start with '# ' are comments, so "
+        "hashtags can be blocked.  The file is re-read when it changes.",
+    ),
+    cfg.BoolOpt(
+        "content_filter_pii",
+        default=False,
+        help="Block tweets containing personal data: email addresses "
+        "(except winlink.org), US phone numbers written as 555-123-4567 "
+        "or (555) 123-4567, and US SSNs.",
+    ),
+    cfg.IntOpt(
+        "content_filter_reload_interval",
+        default=60,
+        min=1,
+        help="How often (in seconds) to check the blocklist file for changes.",
+    ),
+    cfg.StrOpt(
+        "tweet_index_file",
+        help="File to keep the index of posted tweets in, so 'tw del <n>' "
+        "and 'tw status <n>' keep working across restarts.  "
+        "If not set the index is only kept in memory.",
+    ),
+    cfg.IntOpt(
+        "tweet_index_size",
+        default=20,
+        min=1,
+        help="How many recent tweets to remember per callsign.",
+    ),
+    cfg.BoolOpt(
+        "schedule_enabled",
+        default=True,
+        help="Allow scheduling tweets with 'tw @HHMMZ <message>'.",
+    ),
+    cfg.StrOpt(
+        "schedule_file",
+        help="File to keep scheduled tweets in so they survive a restart.  "
+        "Defaults to twitter_schedule.journal in the aprsd save_location.",
+    ),
+    cfg.BoolOpt(
+        "async_backend",
+        default=False,
+        help="Post tweets from an asyncio event loop thread instead of the "
+        "packet thread.  The reply is sent once the tweet is posted.  "
+        "Requires the aprsd-twitter-plugin[async] extra.",
+    ),
+    cfg.IntOpt(
+        "async_max_concurrency",
+        default=8,
+        min=1,
+        help="How many tweets the async backend posts at the same time.",
+    ),
+    cfg.IntOpt(
+        "async_timeout",
+        default=30,
+        min=1,
+        help="Seconds before the async backend gives up on a single post.",
+    ),
+    cfg.IntOpt(
+        "retry_max_attempts",
+        default=5,
+        min=1,
+        help="How many times to try posting a tweet that fails with a "
+        "transient error or a rate limit.",
+    ),
+    cfg.FloatOpt(
+        "retry_base_delay",
+        default=2.0,
+        min=0,
+        help="Backoff (in seconds) before the first retry.  It doubles "
+        "for every retry and is randomized (jitter).",
+    ),
+    cfg.FloatOpt(
+        "retry_max_delay",
+        default=300.0,
+        min=0,
+        help="Longest backoff (in seconds) between retries.",
+    ),
+    cfg.BoolOpt(
+        "stats_enabled",
+        default=True,
+        help="Publish live counters to a memory-mapped file for "
+        "'aprsd-twitter-plugin stats' and 'aprsd-twitter-plugin top'.",
+    ),
+    cfg.StrOpt(
+        "stats_file",
+        help="Path of the memory-mapped stats file.  "
+        "Defaults to twitter_stats.mmap in the aprsd save_location.",
+    ),
+    cfg.BoolOpt(
+        "warmup_enabled",
+        default=True,
+        help="Log in and open the connection to the Twitter API in the "
+        "background at startup, and keep it open while idle.",
+    ),
+    cfg.IntOpt(
+        "warmup_interval",
+        default=240,
+        min=10,
+        help="Seconds of idle time before the connection is probed to keep it alive.",
+    ),
+    cfg.IntOpt(
+        "dns_cache_ttl",
+        default=300,
+        min=0,
+        help="Seconds to cache the DNS lookup of the Twitter API host.",
+    ),
+    cfg.IntOpt(
+        "map_track_points",
+        default=500,
+        min=2,
+        help="How many recent positions to keep per callsign for 'tw map'.",
+    ),
+    cfg.IntOpt(
+        "map_window",
+        default=7200,
+        min=60,
+        help="Seconds of track history drawn by 'tw map'.",
+    ),
+    cfg.IntOpt(
+        "map_max_callsigns",
+        default=1000,
+        min=1,
+        help="How many callsigns to keep tracks for, the least recently heard are dropped.",
+    ),
+    cfg.IntOpt(
+        "media_chunk_size",
+        default=512 * 1024,
+        min=1024,
+        max=5 * 1024 * 1024,
+        help="Size in bytes of each chunk of a media upload.",
+    ),
+    cfg.StrOpt(
+        "media_state_dir",
+        help="Directory where unfinished media uploads are tracked so "
+        "they can be resumed.  Defaults to twitter_media in the aprsd "
+        "save_location.",
+    ),
+    cfg.ListOpt(
+        "sinks",
+        default=[],
+        help="Extra destinations that get a copy of every tweet: "
+        "webhook, mastodon and/or file.  Each one is sent to in the "
+        "background, a slow or failing sink never delays the tweet.",
+    ),
+    cfg.StrOpt(
+        "webhook_url",
+        help="URL the webhook sink POSTs {'callsign': ..., 'text': ...} JSON to.",
+    ),
+    cfg.DictOpt(
+        "webhook_headers",
+        default={},
+        help="Extra HTTP headers for the webhook sink, ie. Authorization:Bearer abc",
+    ),
+    cfg.StrOpt(
+        "mastodon_url",
+        help="Base URL of the Mastodon compatible server, ie. https://mastodon.radio",
+    ),
+    cfg.StrOpt(
+        "mastodon_token",
+        secret=True,
+        help="Access token of the Mastodon account to post as.",
+    ),
+    cfg.StrOpt(
+        "sink_file",
+        help="JSON lines file the file sink appends every message to.",
+    ),
+    cfg.IntOpt(
+        "sink_concurrency",
+        default=2,
+        min=1,
+        help="Posts each sink may have in flight at once.",
+    ),
+    cfg.IntOpt(
+        "sink_max_pending",
+        default=100,
+        min=1,
+        help="Posts that may wait for a sink before new ones are dropped.",
+    ),
+    cfg.IntOpt(
+        "sink_timeout",
+        default=10,
+        min=1,
+        help="Seconds to wait for a webhook or Mastodon server to answer.",
+    ),
+    cfg.BoolOpt(
+        "audit_enabled",
+        default=False,
+        help="Keep a structured audit log of every tweet request: "
+        "callsign, msgNo, a hash of the text, tweet id, latency and "
+        "outcome.  Query it with 'aprsd-twitter-plugin audit'.",
+    ),
+    cfg.StrOpt(
+        "audit_dir",
+        help="Directory of the audit log segments.  "
+        "Defaults to twitter_audit in the aprsd save_location.",
+    ),
+    cfg.IntOpt(
+        "audit_max_bytes",
+        default=10 * 1024 * 1024,
+        min=1024,
+        help="Start a new (and gzip the old) audit segment once it is this big.",
+    ),
+    cfg.IntOpt(
+        "audit_max_age",
+        default=86400,
+        min=60,
+        help="Start a new (and gzip the old) audit segment after this many seconds.",
+    ),
+    cfg.FloatOpt(
+        "audit_flush_interval",
+        default=1.0,
+        min=0.1,
+        help="Longest time (in seconds) an audit record waits before it is written.",
+    ),
 ]
 
 ALL_OPTS = twitter_opts
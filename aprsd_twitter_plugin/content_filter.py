@@ -0,0 +1,231 @@
+"""Content filter applied to outgoing tweets.
+
+The blocklist is compiled once into a single trie-shaped regex, so a
+message is scanned in time proportional to its length rather than to
+the number of blocked terms.  Built-in rules catch common personal data
+patterns (email addresses, phone numbers, US SSNs).  When the blocklist
+file changes it is re-read and recompiled on a background thread and
+the new regex is swapped in, so check() never waits for a compile.
+"""
+
+import logging
+import os
+import re
+import threading
+import time
+
+LOG = logging.getLogger("APRSD")
+
+# Longer terms are skipped, nothing that long fits in an APRS message anyway.
+MAX_TERM_LENGTH = 200
+
+# Addresses at these domains are published callsign addresses, not PII.
+PUBLIC_EMAIL_DOMAINS = ("winlink.org",)
+
+PII_RULES = {
+    "pii:email": r"[\w.+-]+@(?!(?:"
+    + "|".join(re.escape(domain) for domain in PUBLIC_EMAIL_DOMAINS)
+    + r")(?![\w.-]))[\w-]+(?:\.[\w-]+)+",
+    # Only the 555-123-4567 and (555) 123-4567 shapes, so frequencies,
+    # tones and times ('147.060 2000', '144.390 1200 baud') don't match.
+    "pii:phone": r"(?<![\w.])(?:\+?1[- ]?)?(?:\(\d{3}\) ?|\d{3}-)\d{3}-\d{4}(?![\w.])",
+    "pii:ssn": r"(?<!\w)\d{3}-\d{2}-\d{4}(?!\w)",
+}
+
+
+def _build_trie(terms):
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+    return trie
+
+
+def _trie_to_regex(node):
+    """Turn a trie node into a regex fragment that shares common prefixes."""
+    terminal = "" in node
+    branches = []
+    leaves = []
+    for char in sorted(key for key in node if key):
+        child = node[char]
+        is_leaf = len(child) == 1 and "" in child
+        if char == " ":
+            # Multi word terms match any run of whitespace.
+            branches.append(r"\s+" + ("" if is_leaf else _trie_to_regex(child)))
+        elif is_leaf:
+            leaves.append(re.escape(char))
+        else:
+            branches.append(re.escape(char) + _trie_to_regex(child))
+
+    if leaves:
+        branches.append(leaves[0] if len(leaves) == 1 else "[" + "".join(leaves) + "]")
+
+    if len(branches) == 1 and not terminal:
+        return branches[0]
+    pattern = "(?:" + "|".join(branches) + ")"
+    if terminal:
+        pattern += "?"
+    return pattern
+
+
+def compile_terms(terms):
+    """Compile a collection of terms into one case-insensitive regex.
+
+    Terms only match on word boundaries, so 'ass' does not block 'class'.
+    Terms longer than MAX_TERM_LENGTH are ignored.  Returns None when
+    there are no terms.
+    """
+    terms = {" ".join(term.lower().split()) for term in terms}
+    terms = {term for term in terms if 0 < len(term) <= MAX_TERM_LENGTH}
+    if not terms:
+        return None
+    body = _trie_to_regex(_build_trie(terms))
+    return re.compile(rf"(?<!\w){body}(?!\w)", re.IGNORECASE)
+
+
+def load_blocklist(path):
+    """Read a blocklist file: one term per line.
+
+    Lines that are just '#' or start with '# ' are comments, so hashtags
+    such as '#badtag' can still be blocked.
+    """
+    terms = set()
+    with open(path, encoding="utf-8") as fh:
+        for lineno, line in enumerate(fh, 1):
+            line = " ".join(line.lower().split())
+            if not line or line == "#" or line.startswith("# "):
+                continue
+            if len(line) > MAX_TERM_LENGTH:
+                LOG.warning(f"Blocklist {path}:{lineno} longer than {MAX_TERM_LENGTH}, skipped")
+                continue
+            terms.add(line)
+    return terms
+
+
+class ContentFilter:
+    """Scan tweet text against the blocklist and the built-in PII rules."""
+
+    def __init__(self, blocklist_path=None, pii=True, reload_interval=60):
+        self.blocklist_path = blocklist_path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        # serializes reloads, check() never takes it
+        self._reload_lock = threading.Lock()
+        self._reloader = None
+        self._terms = frozenset()
+        self._regex = None
+        self._file_sig = None
+        self._next_check = 0
+        self._hits = {}
+        self._logged_hits = {}
+        self._pii = None
+        if pii:
+            self._pii = re.compile(
+                "|".join(f"(?P<{self._group(name)}>{rx})" for name, rx in PII_RULES.items()),
+                re.IGNORECASE,
+            )
+        self.reload(force=True)
+
+    @staticmethod
+    def _group(rule_name):
+        return rule_name.replace(":", "_")
+
+    def reload(self, force=False):
+        """Reload the blocklist if the file changed since the last load.
+
+        The regex is only recompiled when the set of terms actually
+        changed, and hit counters for terms that are still present survive.
+        The file is read and compiled without holding the lock check()
+        uses, only the swap of the compiled regex is locked.
+        """
+        if not self.blocklist_path:
+            return False
+        with self._reload_lock:
+            try:
+                st = os.stat(self.blocklist_path)
+            except OSError as ex:
+                if force:
+                    LOG.error(f"Content filter blocklist {self.blocklist_path} unreadable: {ex}")
+                return False
+
+            sig = (st.st_mtime_ns, st.st_size)
+            if not force and sig == self._file_sig:
+                return False
+
+            try:
+                terms = frozenset(load_blocklist(self.blocklist_path))
+            except (OSError, UnicodeDecodeError) as ex:
+                LOG.error(f"Failed to read content filter blocklist: {ex}")
+                return False
+
+            self._file_sig = sig
+            if terms == self._terms:
+                return False
+
+            added = terms - self._terms
+            removed = self._terms - terms
+            regex = compile_terms(terms)
+            with self._lock:
+                self._regex = regex
+                self._terms = terms
+                for term in removed:
+                    self._hits.pop(f"blocklist:{term}", None)
+                hits = dict(self._hits)
+
+        LOG.info(
+            f"Content filter loaded {len(terms)} terms "
+            f"({len(added)} added, {len(removed)} removed), hits {hits}",
+        )
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.reload_interval
+            hits = dict(self._hits)
+            changed = hits != self._logged_hits
+            self._logged_hits = hits
+            reloader = None
+            if self.blocklist_path and not (self._reloader and self._reloader.is_alive()):
+                reloader = self._reloader = threading.Thread(
+                    target=self.reload,
+                    name="ContentFilterReload",
+                    daemon=True,
+                )
+
+        # Report the per-rule counters once per interval, when they moved.
+        if changed:
+            LOG.info(f"Content filter hits {hits}")
+        if reloader:
+            reloader.start()
+
+    def check(self, text):
+        """Return the list of rules the text violates, empty if it is clean."""
+        self._maybe_reload()
+        matched = []
+        regex = self._regex
+        if regex:
+            for match in regex.finditer(text):
+                rule = "blocklist:" + " ".join(match.group(0).lower().split())
+                if rule not in matched:
+                    matched.append(rule)
+        if self._pii:
+            for match in self._pii.finditer(text):
+                rule = match.lastgroup.replace("_", ":", 1)
+                if rule not in matched:
+                    matched.append(rule)
+
+        if matched:
+            with self._lock:
+                for rule in matched:
+                    self._hits[rule] = self._hits.get(rule, 0) + 1
+        return matched
+
+    def stats(self):
+        """Return per-rule hit counters."""
+        with self._lock:
+            return dict(self._hits)
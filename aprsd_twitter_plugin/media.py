@@ -0,0 +1,336 @@
+"""Position track images for 'tw map'.
+
+Position packets seen by aprsd are kept per callsign, the recent track
+is drawn as a plain line plot (no map tiles) into a PNG using only the
+standard library, and the image is uploaded with the chunked
+INIT/APPEND/FINALIZE media protocol.  Upload progress is saved after
+every chunk, with a copy of the image, so an interrupted upload resumes
+where it stopped when it is retried.
+"""
+
+import collections
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+
+from aprsd import packets
+
+LOG = logging.getLogger("APRSD")
+
+WHITE = (255, 255, 255)
+GRID = (220, 220, 220)
+TRACK = (30, 60, 200)
+START = (0, 160, 0)
+END = (220, 0, 0)
+
+
+class TrackStore:
+    """Recent positions per callsign.
+
+    Registered with aprsd's packet collector, which sees every packet
+    received (plugins only see the messages addressed to us).  Only the
+    ``max_callsigns`` most recently heard callsigns are kept, and
+    callsigns not heard for ``max_age`` seconds are dropped.
+    """
+
+    def __init__(self, max_points=500, max_callsigns=1000, max_age=None):
+        self.max_points = max_points
+        self.max_callsigns = max_callsigns
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        # least recently heard first
+        self._tracks = collections.OrderedDict()
+
+    def __call__(self):
+        # The collector calls each monitor to get the object to use.
+        return self
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tracks)
+
+    def add(self, callsign, latitude, longitude, timestamp=None):
+        if not latitude and not longitude:
+            # 0,0 means the packet had no position
+            return
+        now = time.time()
+        point = (timestamp or now, latitude, longitude)
+        with self._lock:
+            track = self._tracks.get(callsign)
+            if track is None:
+                track = self._tracks[callsign] = collections.deque(maxlen=self.max_points)
+            else:
+                self._tracks.move_to_end(callsign)
+            track.append(point)
+            self._evict(now)
+
+    def _evict(self, now):
+        while len(self._tracks) > self.max_callsigns:
+            self._tracks.popitem(last=False)
+        if self.max_age is None:
+            return
+        cutoff = now - self.max_age
+        while self._tracks and next(iter(self._tracks.values()))[-1][0] < cutoff:
+            self._tracks.popitem(last=False)
+
+    def track(self, callsign, since=0):
+        """Return the (time, lat, lon) points newer than ``since``, oldest first."""
+        with self._lock:
+            return [point for point in self._tracks.get(callsign, ()) if point[0] >= since]
+
+    def rx(self, packet):
+        # Objects are placed by a station, they aren't where it is.
+        if isinstance(packet, packets.GPSPacket) and not isinstance(packet, packets.ObjectPacket):
+            self.add(packet.from_call, packet.latitude, packet.longitude, packet.timestamp)
+
+    def tx(self, packet):
+        pass
+
+    def flush(self):
+        pass
+
+    def load(self):
+        pass
+
+
+def _png_chunk(kind, data):
+    chunk = kind + data
+    return struct.pack(">I", len(data)) + chunk + struct.pack(">I", zlib.crc32(chunk))
+
+
+def encode_png(pixels, width, height):
+    """Encode an RGB bytearray (row major) as a PNG."""
+    stride = width * 3
+    raw = b"".join(
+        b"\0" + bytes(pixels[row * stride : (row + 1) * stride]) for row in range(height)
+    )
+    return b"".join(
+        (
+            b"\x89PNG\r\n\x1a\n",
+            _png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)),
+            _png_chunk(b"IDAT", zlib.compress(raw, 9)),
+            _png_chunk(b"IEND", b""),
+        ),
+    )
+
+
+class _Canvas:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.pixels = bytearray(WHITE * (width * height))
+
+    def dot(self, x, y, color, size=1):
+        for py in range(y - size + 1, y + size):
+            for px in range(x - size + 1, x + size):
+                if 0 <= px < self.width and 0 <= py < self.height:
+                    offset = (py * self.width + px) * 3
+                    self.pixels[offset : offset + 3] = bytes(color)
+
+    def line(self, x0, y0, x1, y1, color):
+        # Bresenham
+        dx = abs(x1 - x0)
+        dy = -abs(y1 - y0)
+        sx = 1 if x0 < x1 else -1
+        sy = 1 if y0 < y1 else -1
+        err = dx + dy
+        while True:
+            self.dot(x0, y0, color, size=2)
+            if x0 == x1 and y0 == y1:
+                return
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x0 += sx
+            if e2 <= dx:
+                err += dx
+                y0 += sy
+
+
+def render_track(points, width=480, height=360, margin=20):
+    """Draw a track of (time, lat, lon) points and return PNG bytes."""
+    canvas = _Canvas(width, height)
+    for x in range(0, width, 40):
+        canvas.line(x, 0, x, height - 1, GRID)
+    for y in range(0, height, 40):
+        canvas.line(0, y, width - 1, y, GRID)
+
+    lats = [p[1] for p in points]
+    lons = [p[2] for p in points]
+    # Equirectangular projection, good enough for a local track.
+    xscale = math.cos(math.radians(sum(lats) / len(lats)))
+    span_x = max((max(lons) - min(lons)) * xscale, 1e-6)
+    span_y = max(max(lats) - min(lats), 1e-6)
+    scale = min((width - 2 * margin) / span_x, (height - 2 * margin) / span_y)
+    mid_lon = (max(lons) + min(lons)) / 2
+    mid_lat = (max(lats) + min(lats)) / 2
+
+    def project(lat, lon):
+        x = width / 2 + (lon - mid_lon) * xscale * scale
+        y = height / 2 - (lat - mid_lat) * scale
+        return int(round(x)), int(round(y))
+
+    xy = [project(lat, lon) for _, lat, lon in points]
+    for (x0, y0), (x1, y1) in zip(xy, xy[1:], strict=False):
+        canvas.line(x0, y0, x1, y1, TRACK)
+    canvas.dot(*xy[0], START, size=5)
+    canvas.dot(*xy[-1], END, size=5)
+    return encode_png(canvas.pixels, width, height)
+
+
+class RenderCache:
+    """Small LRU cache of rendered images."""
+
+    def __init__(self, size=32):
+        self.size = size
+        self._lock = threading.Lock()
+        self._images = collections.OrderedDict()
+
+    def get(self, key, render):
+        """Return the cached image for ``key``, calling ``render()`` on a miss."""
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+
+        image = render()
+        with self._lock:
+            self._images[key] = image
+            while len(self._images) > self.size:
+                self._images.popitem(last=False)
+        return image
+
+
+def image_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def load_image(state_dir, digest):
+    """Return the image kept for an unfinished upload, or None."""
+    try:
+        with open(os.path.join(state_dir, f"{digest}.data"), "rb") as fh:
+            return fh.read()
+    except OSError:
+        return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ChunkedUploader:
+    """Upload media with INIT/APPEND/FINALIZE, resuming interrupted uploads.
+
+    Progress for each image (keyed by its sha256) and a copy of the image
+    are kept in ``state_dir`` until the upload is finalized or discarded.
+    State whose media id expired is deleted when it is next read.
+    """
+
+    def __init__(self, api, state_dir, chunk_size=512 * 1024):
+        self.api = api
+        self.state_dir = state_dir
+        self.chunk_size = chunk_size
+
+    def _state_path(self, digest):
+        return os.path.join(self.state_dir, f"{digest}.json")
+
+    def _image_path(self, digest):
+        return os.path.join(self.state_dir, f"{digest}.data")
+
+    def _load_state(self, path):
+        try:
+            with open(path, encoding="utf-8") as fh:
+                state = json.load(fh)
+            if state["expires_at"] > time.time() and state["chunk_size"] == self.chunk_size:
+                return state
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as ex:
+            LOG.warning(f"Ignoring bad upload state {path}: {ex!r}")
+        # expired or unusable, the upload has to start over
+        _remove(path)
+        return None
+
+    def _save(self, path, data):
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+
+    def _save_state(self, path, state):
+        self._save(path, json.dumps(state).encode("utf-8"))
+
+    def sweep(self, max_age=86400):
+        """Delete expired state, and images and temp files older than ``max_age``."""
+        try:
+            names = os.listdir(self.state_dir)
+        except OSError:
+            return
+        now = time.time()
+        for name in names:
+            path = os.path.join(self.state_dir, name)
+            if name.endswith(".json"):
+                self._load_state(path)
+            elif name.endswith((".data", ".tmp")):
+                try:
+                    if now - os.path.getmtime(path) > max_age:
+                        os.remove(path)
+                except OSError:
+                    pass
+
+    def discard(self, data):
+        """Forget the state and image of an upload that won't be retried."""
+        digest = image_digest(data)
+        _remove(self._state_path(digest))
+        _remove(self._image_path(digest))
+
+    def upload(self, data, media_type="image/png"):
+        """Upload ``data`` and return the media id."""
+        os.makedirs(self.state_dir, exist_ok=True)
+        digest = image_digest(data)
+        path = self._state_path(digest)
+        if not os.path.exists(self._image_path(digest)):
+            # a retry reads the image back from here
+            self._save(self._image_path(digest), data)
+        state = self._load_state(path)
+        if state:
+            LOG.info(f"Resuming upload of media {state['media_id']} at chunk {state['segment']}")
+        else:
+            media = self.api.chunked_upload_init(
+                len(data),
+                media_type,
+                media_category="tweet_image",
+            )
+            state = {
+                "media_id": str(getattr(media, "media_id_string", None) or media.media_id),
+                "segment": 0,
+                "chunk_size": self.chunk_size,
+                "expires_at": time.time() + (getattr(media, "expires_after_secs", None) or 3600),
+            }
+            self._save_state(path, state)
+
+        buf = io.BytesIO(data)
+        buf.seek(state["segment"] * self.chunk_size)
+        while True:
+            chunk = buf.read(self.chunk_size)
+            if not chunk:
+                break
+            self.api.chunked_upload_append(state["media_id"], chunk, state["segment"])
+            state["segment"] += 1
+            self._save_state(path, state)
+
+        self.api.chunked_upload_finalize(state["media_id"])
+        _remove(path)
+        _remove(self._image_path(digest))
+        return state["media_id"]
@@ -0,0 +1,128 @@
+"""Classify posting errors and decide whether to retry them.
+
+Transient errors (5xx, network trouble, timeouts) and rate limiting are
+retried with capped exponential backoff and full jitter.  Everything
+else fails fast with a reply that tells the operator what went wrong.
+"""
+
+import logging
+import random
+import threading
+import time
+
+import requests
+import tweepy
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+LOG = logging.getLogger("APRSD")
+
+TRANSIENT = "transient"
+RATE_LIMIT = "rate_limit"
+DUPLICATE = "duplicate"
+AUTH = "auth"
+CONTENT = "content"
+UNKNOWN = "unknown"
+
+ERROR_CLASSES = (TRANSIENT, RATE_LIMIT, DUPLICATE, AUTH, CONTENT, UNKNOWN)
+RETRYABLE = frozenset((TRANSIENT, RATE_LIMIT))
+
+# Twitter API error codes
+DUPLICATE_CODES = frozenset((187,))
+AUTH_CODES = frozenset((32, 64, 89, 99, 135, 215, 220, 261, 326))
+
+REPLIES = {
+    DUPLICATE: "Tweet failed: duplicate of a recent tweet",
+    AUTH: "Tweet failed: Twitter auth error",
+    CONTENT: "Tweet failed: rejected by Twitter",
+    UNKNOWN: "Tweet failed",
+}
+
+
+def classify(ex):
+    """Return the error class of an exception raised while posting."""
+    if isinstance(ex, tweepy.TooManyRequests):
+        return RATE_LIMIT
+    if isinstance(ex, tweepy.TwitterServerError):
+        return TRANSIENT
+    if isinstance(ex, tweepy.HTTPException):
+        codes = set(ex.api_codes)
+        messages = " ".join(str(msg) for msg in ex.api_messages).lower()
+        if codes & DUPLICATE_CODES or "duplicate" in messages:
+            return DUPLICATE
+        if isinstance(ex, tweepy.Unauthorized) or codes & AUTH_CODES:
+            return AUTH
+        if isinstance(ex, tweepy.Forbidden | tweepy.BadRequest):
+            return CONTENT
+        return UNKNOWN
+    if isinstance(ex, tweepy.TweepyException):
+        # tweepy wraps connection errors as a plain TweepyException.
+        return TRANSIENT
+    if isinstance(ex, requests.RequestException | ConnectionError | TimeoutError):
+        return TRANSIENT
+    if aiohttp and isinstance(ex, aiohttp.ClientError):
+        return TRANSIENT
+    return UNKNOWN
+
+
+def _rate_limit_reset(ex):
+    """Seconds until the rate limit window resets, if Twitter told us."""
+    response = getattr(ex, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    reset = headers.get("x-rate-limit-reset")
+    if reset is None:
+        return None
+    try:
+        return max(0.0, int(reset) - time.time())
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """Decide retries and keep per error class counters."""
+
+    def __init__(self, max_attempts=5, base_delay=2.0, max_delay=300.0, rng=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(ERROR_CLASSES + ("retried", "gave_up"), 0)
+
+    def backoff(self, attempt):
+        """Capped exponential backoff with full jitter for ``attempt`` (1 based)."""
+        ceiling = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return self._rng.uniform(0, ceiling)
+
+    def failed(self, ex, attempt):
+        """Record a failed attempt.
+
+        Returns (error class, delay) where delay is the number of seconds
+        to wait before the next attempt, or None to give up.
+        """
+        error_class = classify(ex)
+        delay = None
+        if error_class in RETRYABLE and attempt < self.max_attempts:
+            delay = self.backoff(attempt)
+            if error_class == RATE_LIMIT:
+                reset = _rate_limit_reset(ex)
+                if reset is not None:
+                    delay = min(self.max_delay, max(delay, reset))
+
+        with self._lock:
+            self._counters[error_class] += 1
+            self._counters["retried" if delay is not None else "gave_up"] += 1
+        return error_class, delay
+
+    def reply(self, error_class, attempt):
+        """The APRS reply for a failure we gave up on."""
+        if error_class in RETRYABLE:
+            return f"Tweet failed after {attempt} tries"
+        return REPLIES[error_class]
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
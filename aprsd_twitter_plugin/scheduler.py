@@ -0,0 +1,226 @@
+"""Scheduled tweets.
+
+Pending tweets live in a min-heap ordered by due time and a single
+thread sleeps until the earliest one is due.  Every change is appended
+to a journal file so the schedule survives restarts; the journal is
+compacted when it mostly contains finished entries.
+"""
+
+import datetime
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+from aprsd.threads import APRSDThread, APRSDThreadList
+
+LOG = logging.getLogger("APRSD")
+
+SCHEDULE_REGEX = re.compile(r"^@(?P<hour>[01]\d|2[0-3])(?P<minute>[0-5]\d)Z\s+(?P<text>.*)$", re.I)
+
+
+def parse_schedule(text, now=None):
+    """Split '@1800Z Net starts' into (due epoch, 'Net starts').
+
+    The time is the next occurrence of HHMM in UTC.  Returns
+    (None, text) when the text doesn't start with a schedule.
+    """
+    match = SCHEDULE_REGEX.match(text)
+    if not match:
+        return None, text
+
+    now = now or datetime.datetime.now(datetime.UTC)
+    due = now.replace(
+        hour=int(match.group("hour")),
+        minute=int(match.group("minute")),
+        second=0,
+        microsecond=0,
+    )
+    if due <= now:
+        due += datetime.timedelta(days=1)
+    return due.timestamp(), match.group("text")
+
+
+class TweetScheduler(APRSDThread):
+    """Post tweets at their due time from one timer thread.
+
+    ``callback`` is called with the entry dict (id, due, callsign, text
+    and any extra fields) from the scheduler thread when an entry is due.
+    Without a ``path`` nothing is persisted.
+    """
+
+    compact_min = 100
+
+    def __init__(self, callback, path=None, name="TwitterScheduler"):
+        super().__init__(name)
+        self.callback = callback
+        self.path = path
+        self._cond = threading.Condition()
+        self._heap = []
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._done = 0
+        self._journal = None
+        if self.path:
+            try:
+                self.path = os.fspath(self.path)
+                self._load()
+            except Exception:
+                # Never started, so don't leave it in the thread list.
+                APRSDThreadList().remove(self)
+                raise
+
+    def _load(self):
+        pending = {}
+        last_id = 0
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        record = json.loads(line)
+                        item_id = int(record["id"])
+                        if record["op"] == "add":
+                            entry = record["entry"]
+                            float(entry["due"])
+                            pending[item_id] = entry
+                        else:
+                            pending.pop(item_id, None)
+                    except (ValueError, KeyError, TypeError):
+                        # A torn write at the end of the journal, or a
+                        # record we don't understand.
+                        LOG.warning(f"Skipping bad tweet schedule record {line.strip()!r}")
+                        continue
+                    last_id = max(last_id, item_id)
+        except FileNotFoundError:
+            pass
+
+        self._ids = itertools.count(last_id + 1)
+        for item_id, entry in pending.items():
+            self._pending[item_id] = entry
+            self._heap.append((entry["due"], item_id))
+        heapq.heapify(self._heap)
+        if pending:
+            LOG.info(f"Loaded {len(pending)} scheduled tweets")
+        self._compact()
+
+    def _compact(self):
+        """Rewrite the journal with only the pending entries.
+
+        If the rewrite fails the old journal is kept and appended to.  The
+        very first open raises, so a schedule that can't be persisted is
+        never silently accepted.
+        """
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                for item_id, entry in self._pending.items():
+                    fh.write(json.dumps({"op": "add", "id": item_id, "entry": entry}) + "\n")
+            if self._journal:
+                self._journal.close()
+                self._journal = None
+            os.replace(tmp, self.path)
+            self._journal = open(self.path, "a", encoding="utf-8")
+        except OSError as ex:
+            LOG.error(f"Failed to write tweet schedule {self.path}: {ex}")
+            if self._journal is None:
+                self._journal = open(self.path, "a", encoding="utf-8")
+        self._done = 0
+
+    def _append(self, record):
+        if not self._journal:
+            return
+        try:
+            self._journal.write(json.dumps(record) + "\n")
+            self._journal.flush()
+        except OSError as ex:
+            LOG.error(f"Failed to write tweet schedule {self.path}: {ex}")
+
+    def schedule(self, due, callsign, text, **fields):
+        """Add a tweet to be posted at ``due`` (epoch seconds).  Returns its id.
+
+        Extra keyword ``fields`` are stored in the entry as-is.
+        """
+        with self._cond:
+            item_id = next(self._ids)
+            entry = {**fields, "id": item_id, "due": due, "callsign": callsign, "text": text}
+            self._pending[item_id] = entry
+            heapq.heappush(self._heap, (due, item_id))
+            self._append({"op": "add", "id": item_id, "entry": entry})
+            # Only wake the thread if this is the new earliest entry.
+            if self._heap[0][1] == item_id:
+                self._cond.notify()
+        return item_id
+
+    def cancel(self, item_id):
+        """Drop a pending entry.  Returns True if it was pending."""
+        with self._cond:
+            # The heap entry is skipped lazily when it comes due.
+            if self._pending.pop(item_id, None) is None:
+                return False
+            self._finish(item_id)
+        return True
+
+    def _finish(self, item_id):
+        self._append({"op": "done", "id": item_id})
+        self._done += 1
+        if self.path and self._done > max(self.compact_min, len(self._pending)):
+            self._compact()
+
+    def pending(self, callsign=None):
+        """Return pending entries, earliest first."""
+        with self._cond:
+            entries = [
+                entry
+                for entry in self._pending.values()
+                if callsign is None or entry["callsign"] == callsign
+            ]
+        return sorted(entries, key=lambda entry: entry["due"])
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def stop(self):
+        super().stop()
+        with self._cond:
+            self._cond.notify()
+
+    def loop(self):
+        with self._cond:
+            if self.thread_stop:
+                return False
+            if not self._heap:
+                self._cond.wait()
+                return True
+
+            due, item_id = self._heap[0]
+            delay = due - time.time()
+            if delay > 0:
+                self._cond.wait(delay)
+                return True
+
+            heapq.heappop(self._heap)
+            entry = self._pending.pop(item_id, None)
+
+        if entry is None:
+            # cancelled
+            return True
+
+        try:
+            self.callback(entry)
+        except Exception as ex:
+            LOG.error(f"Scheduled tweet {item_id} failed")
+            LOG.exception(ex)
+
+        with self._cond:
+            self._finish(item_id)
+        return True
+
+    def _cleanup(self):
+        if self._journal:
+            self._journal.close()
+            self._journal = None
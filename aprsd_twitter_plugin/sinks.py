@@ -0,0 +1,219 @@
+"""Destinations a tweet can be sent to.
+
+Twitter is the primary sink and keeps the full pipeline (retries, #n
+handles, replies).  Extra sinks (a webhook, a Mastodon compatible
+server, a JSON lines file) get a copy of every message.  Each extra
+sink runs in its own small thread pool with its own HTTP connection
+pool, a limit on queued posts and a breaker that pauses it after
+repeated failures, so a slow or broken sink never delays the others.
+"""
+
+import concurrent.futures
+import json
+import logging
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+LOG = logging.getLogger("APRSD")
+
+
+class Sink:
+    """A destination for messages."""
+
+    name = "sink"
+
+    def post(self, text, callsign=None):
+        """Send ``text``, return an id for it (or None if not sent)."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class TweepySink(Sink):
+    """Post with the tweepy v1.1 API.
+
+    ``get_client`` returns the (shared) tweepy API object or None when we
+    can't log in.
+    """
+
+    name = "twitter"
+
+    def __init__(self, get_client):
+        self.get_client = get_client
+        self.last_response = None
+
+    def post(self, text, callsign=None, **kwargs):
+        client = self.get_client()
+        if not client:
+            return None
+        status = client.update_status(text, **kwargs)
+        self.last_response = getattr(client, "last_response", None)
+        return status.id
+
+
+class WebhookSink(Sink):
+    """POST each message as JSON to a URL."""
+
+    name = "webhook"
+
+    def __init__(self, url, headers=None, timeout=10, pool_size=2):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if headers:
+            self.session.headers.update(headers)
+
+    def _payload(self, text, callsign):
+        return {"callsign": callsign, "text": text}
+
+    def post(self, text, callsign=None):
+        response = self.session.post(
+            self.url,
+            json=self._payload(text, callsign),
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        try:
+            return response.json().get("id")
+        except (ValueError, AttributeError):
+            return None
+
+    def close(self):
+        self.session.close()
+
+
+class MastodonSink(WebhookSink):
+    """Post a status to a Mastodon compatible server."""
+
+    name = "mastodon"
+
+    def __init__(self, base_url, access_token, timeout=10, pool_size=2):
+        super().__init__(
+            f"{base_url.rstrip('/')}/api/v1/statuses",
+            headers={"Authorization": f"Bearer {access_token}"},
+            timeout=timeout,
+            pool_size=pool_size,
+        )
+
+    def _payload(self, text, callsign):
+        return {"status": text}
+
+
+class FileSink(Sink):
+    """Append each message as a JSON line to a file."""
+
+    name = "file"
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._count = 0
+
+    def post(self, text, callsign=None):
+        line = json.dumps({"time": time.time(), "callsign": callsign, "text": text})
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(line + "\n")
+            self._count += 1
+            return self._count
+
+
+class SinkWorker:
+    """Run one sink in its own thread pool.
+
+    At most ``max_pending`` posts wait or run at once, more are dropped.
+    After ``failure_threshold`` failures in a row the sink is skipped for
+    ``cooldown`` seconds.
+    """
+
+    def __init__(self, sink, concurrency=2, max_pending=100, failure_threshold=5, cooldown=60):
+        self.sink = sink
+        self.max_pending = max_pending
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=concurrency,
+            thread_name_prefix=f"TwitterSink-{sink.name}",
+        )
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._failures = 0
+        self._paused_until = 0.0
+        self._counters = {"sent": 0, "failed": 0, "dropped": 0}
+
+    def submit(self, text, callsign=None):
+        """Queue a post, returns its Future or None if it was dropped."""
+        with self._lock:
+            if self._pending >= self.max_pending or time.monotonic() < self._paused_until:
+                self._counters["dropped"] += 1
+                return None
+            self._pending += 1
+        try:
+            return self._pool.submit(self._post, text, callsign)
+        except RuntimeError:
+            # the pool was shut down
+            with self._lock:
+                self._pending -= 1
+                self._counters["dropped"] += 1
+            return None
+
+    def _post(self, text, callsign):
+        try:
+            result = self.sink.post(text, callsign=callsign)
+        except Exception as ex:
+            LOG.error(f"Sending to {self.sink.name} failed: {ex!r}")
+            with self._lock:
+                self._counters["failed"] += 1
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    LOG.warning(
+                        f"{self.sink.name} failed {self._failures} times in a row, "
+                        f"pausing it for {self.cooldown}s",
+                    )
+                    self._paused_until = time.monotonic() + self.cooldown
+                    self._failures = 0
+            return None
+        else:
+            with self._lock:
+                self._counters["sent"] += 1
+                self._failures = 0
+            return result
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, pending=self._pending)
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self.sink.close()
+
+
+class SinkDispatcher:
+    """Fan a message out to every extra sink."""
+
+    def __init__(self, workers=()):
+        self.workers = list(workers)
+
+    def __bool__(self):
+        return bool(self.workers)
+
+    def publish(self, text, callsign=None):
+        """Queue ``text`` on every sink, never blocks on a sink."""
+        return [worker.submit(text, callsign) for worker in self.workers]
+
+    def stats(self):
+        return {worker.sink.name: worker.stats() for worker in self.workers}
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
@@ -0,0 +1,160 @@
+"""Live plugin counters in a small memory-mapped file.
+
+The plugin writes fixed-layout counters straight into the mapping and
+``aprsd-twitter-plugin stats`` reads them from another process without
+any HTTP endpoint or file locking.  Counters are single 8 byte slots
+written with one ``struct.pack_into`` call, so readers never see a torn
+value.  Writers in the plugin (packet thread, retry and scheduler
+threads, workers) share one lock, so a counter is incremented and
+published as one step and never goes backwards.  The last error message
+is longer, it is guarded by a sequence number (a seqlock) that readers
+use to detect a concurrent update.
+"""
+
+import mmap
+import os
+import struct
+import threading
+import time
+
+MAGIC = b"ATWS"
+VERSION = 1
+
+DEFAULT_STATS_FILE = os.path.join(
+    os.path.expanduser("~"), ".config", "aprsd", "twitter_stats.mmap"
+)
+
+# Monotonic counters, in file order.
+COUNTERS = (
+    "sent",
+    "failed",
+    "retried",
+    "blocked",
+    "transient",
+    "rate_limit",
+    "duplicate",
+    "auth",
+    "content",
+    "unknown",
+)
+# Values that go up and down, -1 when unknown.
+GAUGES = (
+    "queue_depth",
+    "retry_depth",
+    "rate_limit_remaining",
+    "rate_limit_reset",
+)
+
+ERROR_TEXT_SIZE = 128
+
+# magic, version, pid, started
+HEADER = struct.Struct("<4sIId")
+SLOT = struct.Struct("<q")
+TIME = struct.Struct("<d")
+
+_SLOTS_OFFSET = HEADER.size
+OFFSETS = {name: _SLOTS_OFFSET + index * SLOT.size for index, name in enumerate(COUNTERS + GAUGES)}
+UPDATED_OFFSET = _SLOTS_OFFSET + len(OFFSETS) * SLOT.size
+ERROR_SEQ_OFFSET = UPDATED_OFFSET + TIME.size
+ERROR_TIME_OFFSET = ERROR_SEQ_OFFSET + SLOT.size
+ERROR_TEXT_OFFSET = ERROR_TIME_OFFSET + TIME.size
+SIZE = ERROR_TEXT_OFFSET + ERROR_TEXT_SIZE
+
+
+class StatsFile:
+    """Writer side, owned by the plugin.
+
+    With no ``path`` the counters live in anonymous memory, so the plugin
+    can always publish without checking whether stats are enabled.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        if path:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                os.ftruncate(fd, SIZE)
+                self._mm = mmap.mmap(fd, SIZE)
+            finally:
+                os.close(fd)
+        else:
+            self._mm = mmap.mmap(-1, SIZE)
+
+        self._mm[:SIZE] = bytes(SIZE)
+        HEADER.pack_into(self._mm, 0, MAGIC, VERSION, os.getpid(), time.time())
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(COUNTERS, 0)
+        for name in GAUGES:
+            self.set(name, -1)
+        self._error_seq = 0
+
+    def incr(self, name):
+        # Increment and write under the lock, otherwise a thread holding
+        # an older value could publish it after a newer one.
+        with self._lock:
+            self._counters[name] += 1
+            SLOT.pack_into(self._mm, OFFSETS[name], self._counters[name])
+            TIME.pack_into(self._mm, UPDATED_OFFSET, time.time())
+
+    def set(self, name, value):
+        SLOT.pack_into(self._mm, OFFSETS[name], int(value))
+        TIME.pack_into(self._mm, UPDATED_OFFSET, time.time())
+
+    def error(self, text):
+        """Publish the last error message."""
+        data = text.encode("utf-8", "replace")[:ERROR_TEXT_SIZE].ljust(ERROR_TEXT_SIZE, b"\0")
+        # Writers take the lock, so the seqlock only has to handle readers.
+        with self._lock:
+            self._error_seq += 1
+            SLOT.pack_into(self._mm, ERROR_SEQ_OFFSET, self._error_seq)
+            TIME.pack_into(self._mm, ERROR_TIME_OFFSET, time.time())
+            self._mm[ERROR_TEXT_OFFSET : ERROR_TEXT_OFFSET + ERROR_TEXT_SIZE] = data
+            self._error_seq += 1
+            SLOT.pack_into(self._mm, ERROR_SEQ_OFFSET, self._error_seq)
+
+    def read(self):
+        return read_stats(self._mm)
+
+    def close(self):
+        self._mm.close()
+
+
+def read_stats(buf):
+    """Decode a stats mapping (or any buffer with the same layout)."""
+    magic, version, pid, started = HEADER.unpack_from(buf, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not an aprsd-twitter-plugin stats file")
+
+    stats = {"pid": pid, "started": started}
+    for name, offset in OFFSETS.items():
+        stats[name] = SLOT.unpack_from(buf, offset)[0]
+    stats["updated"] = TIME.unpack_from(buf, UPDATED_OFFSET)[0]
+
+    text = b""
+    error_time = 0.0
+    for _ in range(100):
+        seq = SLOT.unpack_from(buf, ERROR_SEQ_OFFSET)[0]
+        if seq % 2:
+            # a writer is in the middle of an update
+            continue
+        error_time = TIME.unpack_from(buf, ERROR_TIME_OFFSET)[0]
+        text = bytes(buf[ERROR_TEXT_OFFSET : ERROR_TEXT_OFFSET + ERROR_TEXT_SIZE])
+        if SLOT.unpack_from(buf, ERROR_SEQ_OFFSET)[0] == seq:
+            break
+    stats["last_error"] = text.rstrip(b"\0").decode("utf-8", "replace")
+    stats["last_error_time"] = error_time
+    return stats
+
+
+class StatsReader:
+    """Reader side, maps the file read-only."""
+
+    def __init__(self, path=DEFAULT_STATS_FILE):
+        with open(path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), SIZE, access=mmap.ACCESS_READ)
+
+    def read(self):
+        return read_stats(self._mm)
+
+    def close(self):
+        self._mm.close()
@@ -0,0 +1,106 @@
+"""Small local index of posted tweets.
+
+Each callsign gets short numeric handles (#1, #2, ...) for the tweets it
+posted, so operators can refer to them from the radio with 'tw del 3' or
+'tw status 3' without anyone having to search the timeline.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+LOG = logging.getLogger("APRSD")
+
+
+class TweetIndex:
+    """Map per-callsign handles to posted tweet ids.
+
+    Only the newest ``size`` tweets are kept for each callsign.  When
+    ``path`` is set the index is saved to that file as JSON after every
+    change and loaded back on startup.
+    """
+
+    def __init__(self, path=None, size=20):
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        # callsign -> {"next": int, "tweets": OrderedDict(handle -> entry)}
+        self._calls = {}
+        if self.path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as fh:
+                raw = json.load(fh)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as ex:
+            LOG.error(f"Failed to load tweet index {self.path}: {ex}")
+            return
+
+        try:
+            calls = {}
+            for callsign, data in raw.items():
+                tweets = OrderedDict((int(handle), entry) for handle, entry in data["tweets"])
+                calls[callsign] = {"next": int(data["next"]), "tweets": tweets}
+        except (KeyError, TypeError, AttributeError, ValueError) as ex:
+            LOG.error(f"Tweet index {self.path} is malformed, starting empty: {ex!r}")
+            return
+        self._calls = calls
+
+    def _save(self):
+        if not self.path:
+            return
+        raw = {
+            callsign: {"next": data["next"], "tweets": list(data["tweets"].items())}
+            for callsign, data in self._calls.items()
+        }
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as fh:
+                json.dump(raw, fh)
+            os.replace(tmp, self.path)
+        except OSError as ex:
+            LOG.error(f"Failed to save tweet index {self.path}: {ex}")
+
+    def add(self, callsign, tweet_id, text):
+        """Record a posted tweet and return its handle."""
+        with self._lock:
+            data = self._calls.setdefault(callsign, {"next": 1, "tweets": OrderedDict()})
+            handle = data["next"]
+            data["next"] += 1
+            data["tweets"][handle] = {"id": tweet_id, "text": text, "time": time.time()}
+            while len(data["tweets"]) > self.size:
+                data["tweets"].popitem(last=False)
+            self._save()
+        return handle
+
+    def get(self, callsign, handle):
+        """Return the entry for a handle, or None if it isn't known."""
+        with self._lock:
+            data = self._calls.get(callsign)
+            if data:
+                return data["tweets"].get(handle)
+
+    def last(self, callsign):
+        """Return (handle, entry) for the newest tweet, or (None, None)."""
+        with self._lock:
+            data = self._calls.get(callsign)
+            if data and data["tweets"]:
+                return next(reversed(data["tweets"].items()))
+        return None, None
+
+    def remove(self, callsign, handle):
+        """Forget a handle.  Returns the removed entry or None."""
+        with self._lock:
+            data = self._calls.get(callsign)
+            if not data:
+                return None
+            entry = data["tweets"].pop(handle, None)
+            if entry:
+                self._save()
+            return entry
@@ -1,18 +1,68 @@
+import asyncio
+import concurrent.futures
+import datetime
+import functools
 import logging
+import os
+import re
+import threading
+import time
 
 import tweepy
 from aprsd import (
     conf,  # noqa
+    packets,
     plugin,
 )
+from aprsd.packets import collector
+from aprsd.threads import tx
 from oslo_config import cfg
 
 import aprsd_twitter_plugin
+from aprsd_twitter_plugin import (
+    async_backend,
+    audit,
+    content_filter,
+    media,
+    retry,
+    scheduler,
+    sinks,
+    stats,
+    tweet_index,
+    warmup,
+)
 from aprsd_twitter_plugin import conf as twitter_conf  # noqa
 
 CONF = cfg.CONF
 LOG = logging.getLogger("APRSD")
 
+# Subcommands only match when the whole message has the expected shape,
+# so 'tw last night was fun' is still tweeted as-is.
+SUBCOMMAND_REGEX = re.compile(
+    r"^\S+\s+(?:(?P<cmd>last|map|q)|(?P<cmd_arg>status|del)(?:\s+(?P<arg>\d+))?)\s*$",
+    re.IGNORECASE,
+)
+
+
+def parse_command(message):
+    """Parse a message into (subcommand, argument, text) in one pass.
+
+    For a plain tweet subcommand and argument are None and text is the
+    message with the leading command word removed.
+    """
+    match = SUBCOMMAND_REGEX.match(message)
+    if match:
+        cmd = (match.group("cmd") or match.group("cmd_arg")).lower()
+        arg = match.group("arg")
+        return cmd, int(arg) if arg else None, None
+
+    _, _, text = message.partition(" ")
+    return None, None, text
+
+
+def _zulu(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp, datetime.UTC).strftime("%H%MZ")
+
 
 class SendTweetPlugin(plugin.APRSDRegexCommandPluginBase):
     version = aprsd_twitter_plugin.__version__
@@ -23,11 +73,29 @@ class SendTweetPlugin(plugin.APRSDRegexCommandPluginBase):
     command_name = "tweet"
 
     enabled = False
+    content_filter = None
+    tweet_index = None
+    scheduler = None
+    async_poster = None
+    retry_queue = None
+    retry_policy = None
+    stats = None
+    warmer = None
+    tracks = None
+    audit = None
+    twitter = None
+    sinks = None
+    _media_pool = None
+    _dns_cache = None
+    _client = None
 
     def help(self):
         _help = [
             "twitter: Send a Tweet!!",
             "twitter: Format 'tw <message>'",
+            "twitter: 'tw last', 'tw status [n]', 'tw del <n>', 'tw q'",
+            "twitter: 'tw map' tweets a map of your recent track",
+            "twitter: Schedule with 'tw @HHMMZ <message>'",
         ]
         return _help
 
@@ -66,6 +134,192 @@ class SendTweetPlugin(plugin.APRSDRegexCommandPluginBase):
             )
             self.enabled = False
 
+        if CONF.aprsd_twitter_plugin.content_filter_enabled:
+            self.content_filter = content_filter.ContentFilter(
+                blocklist_path=CONF.aprsd_twitter_plugin.content_filter_blocklist,
+                pii=CONF.aprsd_twitter_plugin.content_filter_pii,
+                reload_interval=CONF.aprsd_twitter_plugin.content_filter_reload_interval,
+            )
+
+        self.tweet_index = tweet_index.TweetIndex(
+            path=CONF.aprsd_twitter_plugin.tweet_index_file,
+            size=CONF.aprsd_twitter_plugin.tweet_index_size,
+        )
+
+        self.stats = self._create_stats()
+        self._client_lock = threading.Lock()
+        self.twitter = sinks.TweepySink(self._get_client)
+        self.sinks = self._create_sinks()
+
+        self.retry_policy = retry.RetryPolicy(
+            max_attempts=CONF.aprsd_twitter_plugin.retry_max_attempts,
+            base_delay=CONF.aprsd_twitter_plugin.retry_base_delay,
+            max_delay=CONF.aprsd_twitter_plugin.retry_max_delay,
+        )
+
+        self.tracks = media.TrackStore(
+            max_points=CONF.aprsd_twitter_plugin.map_track_points,
+            max_callsigns=CONF.aprsd_twitter_plugin.map_max_callsigns,
+            max_age=CONF.aprsd_twitter_plugin.map_window,
+        )
+        # Plugins only see messages addressed to us, the collector gets
+        # every packet received.
+        collector.PacketCollector().register(self.tracks)
+        self._render_cache = media.RenderCache()
+        # One worker, rendering and uploading maps is slow but rare.
+        self._media_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1,
+            thread_name_prefix="TwitterMap",
+        )
+
+    def _create_stats(self):
+        """Open the memory-mapped stats file read by 'aprsd-twitter-plugin stats'."""
+        if CONF.aprsd_twitter_plugin.stats_enabled:
+            path = CONF.aprsd_twitter_plugin.stats_file or os.path.join(
+                CONF.save_location,
+                "twitter_stats.mmap",
+            )
+            try:
+                return stats.StatsFile(path)
+            except (OSError, TypeError) as ex:
+                LOG.error(f"Can't open stats file {path}: {ex}")
+        return stats.StatsFile()
+
+    def _create_sinks(self):
+        """Create the extra destinations every message is copied to."""
+        opts = CONF.aprsd_twitter_plugin
+        workers = []
+        for name in opts.sinks or []:
+            if name == "webhook" and opts.webhook_url:
+                sink = sinks.WebhookSink(
+                    opts.webhook_url,
+                    headers=opts.webhook_headers,
+                    timeout=opts.sink_timeout,
+                    pool_size=opts.sink_concurrency,
+                )
+            elif name == "mastodon" and opts.mastodon_url and opts.mastodon_token:
+                sink = sinks.MastodonSink(
+                    opts.mastodon_url,
+                    opts.mastodon_token,
+                    timeout=opts.sink_timeout,
+                    pool_size=opts.sink_concurrency,
+                )
+            elif name == "file" and opts.sink_file:
+                sink = sinks.FileSink(opts.sink_file)
+            else:
+                LOG.error(f"Sink {name} is unknown or not configured, ignoring it")
+                continue
+            workers.append(
+                sinks.SinkWorker(
+                    sink,
+                    concurrency=opts.sink_concurrency,
+                    max_pending=opts.sink_max_pending,
+                ),
+            )
+        return sinks.SinkDispatcher(workers)
+
+    def _publish_queues(self):
+        if self.scheduler:
+            self.stats.set("queue_depth", self.scheduler.pending_count())
+        if self.retry_queue:
+            self.stats.set("retry_depth", self.retry_queue.pending_count())
+
+    def _publish_rate_limit(self, response):
+        headers = getattr(response, "headers", None) or {}
+        try:
+            if "x-rate-limit-remaining" in headers:
+                self.stats.set("rate_limit_remaining", headers["x-rate-limit-remaining"])
+            if "x-rate-limit-reset" in headers:
+                self.stats.set("rate_limit_reset", headers["x-rate-limit-reset"])
+        except (TypeError, ValueError):
+            pass
+
+    def stop_threads(self):
+        super().stop_threads()
+        if self.sinks:
+            self.sinks.close()
+        if self._media_pool:
+            self._media_pool.shutdown(wait=False, cancel_futures=True)
+        if self.tracks is not None:
+            try:
+                collector.PacketCollector().unregister(self.tracks)
+            except ValueError:
+                pass
+
+    def create_threads(self):
+        if not self.enabled:
+            return None
+
+        # Retries wait here so they never hold up the packet thread.
+        self.retry_queue = scheduler.TweetScheduler(self._send_retry, name="TwitterRetry")
+        threads = [self.retry_queue]
+
+        if CONF.aprsd_twitter_plugin.schedule_enabled:
+            path = CONF.aprsd_twitter_plugin.schedule_file or os.path.join(
+                CONF.save_location,
+                "twitter_schedule.journal",
+            )
+            try:
+                self.scheduler = scheduler.TweetScheduler(self._send_scheduled, path=path)
+                threads.append(self.scheduler)
+            except (OSError, TypeError) as ex:
+                LOG.error(f"Can't open tweet schedule {path}, scheduling disabled: {ex}")
+
+        if CONF.aprsd_twitter_plugin.async_backend:
+            if async_backend.available():
+                self.async_poster = async_backend.AsyncPostThread(
+                    consumer_key=CONF.aprsd_twitter_plugin.apiKey,
+                    consumer_secret=CONF.aprsd_twitter_plugin.apiKey_secret,
+                    access_token=CONF.aprsd_twitter_plugin.access_token,
+                    access_token_secret=CONF.aprsd_twitter_plugin.access_token_secret,
+                    max_concurrency=CONF.aprsd_twitter_plugin.async_max_concurrency,
+                    timeout=CONF.aprsd_twitter_plugin.async_timeout,
+                )
+                threads.append(self.async_poster)
+            else:
+                LOG.error(
+                    "aprsd_twitter_plugin.async_backend needs tweepy[async] installed. "
+                    "Posting from the packet thread instead.",
+                )
+
+        if CONF.aprsd_twitter_plugin.audit_enabled:
+            path = CONF.aprsd_twitter_plugin.audit_dir or os.path.join(
+                CONF.save_location,
+                "twitter_audit",
+            )
+            try:
+                self.audit = audit.AuditLog(
+                    path,
+                    max_bytes=CONF.aprsd_twitter_plugin.audit_max_bytes,
+                    max_age=CONF.aprsd_twitter_plugin.audit_max_age,
+                    flush_interval=CONF.aprsd_twitter_plugin.audit_flush_interval,
+                )
+                threads.append(self.audit)
+            except (OSError, TypeError) as ex:
+                LOG.error(f"Can't open audit log {path}, auditing disabled: {ex}")
+
+        if CONF.aprsd_twitter_plugin.warmup_enabled:
+            self._dns_cache = warmup.DNSCache(ttl=CONF.aprsd_twitter_plugin.dns_cache_ttl)
+            self._dns_cache.add_host(warmup.API_HOST)
+            self.warmer = warmup.ConnectionWarmer(
+                self._get_client,
+                interval=CONF.aprsd_twitter_plugin.warmup_interval,
+                dns_cache=self._dns_cache,
+            )
+            threads.append(self.warmer)
+
+        return threads
+
+    def _reply(self, to_call, text):
+        """Send a message to a callsign outside of process()."""
+        tx.send(
+            packets.MessagePacket(
+                from_call=CONF.callsign,
+                to_call=to_call,
+                message_text=text,
+            ),
+        )
+
     def _create_client(self):
         """Create the twitter client object."""
         auth = tweepy.OAuthHandler(
@@ -82,7 +336,9 @@ class SendTweetPlugin(plugin.APRSDRegexCommandPluginBase):
 
         api = tweepy.API(
             bearer_token,
-            wait_on_rate_limit=True,
+            # Rate limits are backed off by the retry queue, never by
+            # sleeping on the packet thread.
+            wait_on_rate_limit=False,
         )
 
         tweepy.OAuth2UserHandler(
@@ -103,33 +359,341 @@ class SendTweetPlugin(plugin.APRSDRegexCommandPluginBase):
 
         return api
 
+    def _get_client(self):
+        """Return the shared client, creating it on first use.
+
+        Reusing one client keeps its HTTP session, and the connection the
+        warmer opened, alive between tweets.
+        """
+        client = self._client
+        if client is None:
+            with self._client_lock:
+                if self._client is None:
+                    client = self._create_client()
+                    if self._dns_cache:
+                        warmup.mount_dns_cache(client, self._dns_cache)
+                    self._client = client
+                client = self._client
+        return client
+
     def process(self, packet):
         """This is called when a received packet matches self.command_regex."""
 
         LOG.info("SendTweetPlugin Plugin")
 
+        started = time.monotonic()
         from_callsign = packet.from_call
-        message = packet.message_text
-        message = message.split(" ")
-        del message[0]
-        message = " ".join(message)
+        msg_no = getattr(packet, "msgNo", None)
+        cmd, arg, message = parse_command(packet.message_text)
 
         # Now we can process
         auth_call = CONF.aprsd_twitter_plugin.callsign
 
         # Only allow the owner of aprsd to send a tweet
         if not from_callsign.startswith(auth_call):
+            self._audit(from_callsign, msg_no, message, "unauthorized", started)
             return f"{from_callsign} not authorized to tweet!"
 
-        client = self._create_client()
-        if not client:
-            LOG.error("No twitter client!!")
+        if cmd:
+            return self._process_subcommand(from_callsign, cmd, arg)
+
+        due, message = scheduler.parse_schedule(message)
+
+        if self.content_filter:
+            rules = self.content_filter.check(message)
+            if rules:
+                LOG.warning(f"Tweet from {from_callsign} blocked by content filter {rules}")
+                self.stats.incr("blocked")
+                self._audit(from_callsign, msg_no, message, "blocked", started)
+                return "Tweet blocked by content filter"
+
+        if due:
+            if not self.scheduler:
+                return "Scheduling is disabled"
+            self.scheduler.schedule(due, from_callsign, message, msg_no=msg_no)
+            self._publish_queues()
+            self._audit(from_callsign, msg_no, message, "scheduled", started)
+            return f"Tweet scheduled for {_zulu(due)}"
+
+        if self.sinks:
+            self.sinks.publish(self._with_hashtags(message), from_callsign)
+
+        if self.async_poster:
+            self.async_poster.submit(
+                self._with_hashtags(message),
+                functools.partial(self._async_done, from_callsign, message, msg_no, started),
+            )
+            return "Tweet queued"
+
+        try:
+            handle = self._send_tweet(from_callsign, message, msg_no, started)
+        except Exception as ex:
+            _, reply = self._tweet_failed(from_callsign, message, 1, ex, msg_no, started)
+            return reply
+
+        if handle is None:
             return "Failed to Auth"
 
+        return f"Tweet sent! #{handle}"
+
+    def _send_tweet(self, from_callsign, message, msg_no=None, started=None):
+        """Post a tweet and return its handle, or None if we couldn't auth."""
+        started = started or time.monotonic()
+        # Now lets tweet!
+        tweet_id = self.twitter.post(self._with_hashtags(message), callsign=from_callsign)
+        if tweet_id is None:
+            LOG.error("No twitter client!!")
+            self._audit(from_callsign, msg_no, message, "auth_failed", started)
+            return None
+
+        self.stats.incr("sent")
+        if self.warmer:
+            self.warmer.touch()
+        self._publish_rate_limit(self.twitter.last_response)
+        self._audit(from_callsign, msg_no, message, "sent", started, tweet_id)
+        return self.tweet_index.add(from_callsign, tweet_id, message)
+
+    def _audit(self, callsign, msg_no, text, outcome, started, tweet_id=None):
+        if self.audit:
+            latency = time.monotonic() - started if started else 0.0
+            self.audit.record(callsign, msg_no, text, outcome, latency, tweet_id)
+
+    def _with_hashtags(self, message):
         if CONF.aprsd_twitter_plugin.add_aprs_hashtag:
             message += " #aprs #aprsd #hamradio https://github.com/hemna/aprsd-twitter-plugin"
+        return message
 
-        # Now lets tweet!
-        client.update_status(message)
+    def _tweet_failed(
+        self,
+        from_callsign,
+        message,
+        attempt,
+        ex,
+        msg_no=None,
+        started=None,
+        **fields,
+    ):
+        """Classify a failed post and queue a retry if it is worth one.
+
+        Extra ``fields`` are kept in the retry entry.  Returns (retrying,
+        reply text).
+        """
+        error_class, delay = self.retry_policy.failed(ex, attempt)
+        if error_class == retry.AUTH:
+            # Credentials may have changed, log in again next time.
+            self._client = None
+        self.stats.incr(error_class)
+        self.stats.error(f"{error_class}: {ex}")
+        self._publish_rate_limit(getattr(ex, "response", None))
+        if delay is not None and self.retry_queue:
+            LOG.warning(
+                f"Tweet from {from_callsign} failed ({error_class}: {ex!r}), "
+                f"retry {attempt + 1} in {delay:.1f}s",
+            )
+            self.retry_queue.schedule(
+                time.time() + delay,
+                from_callsign,
+                message,
+                attempt=attempt + 1,
+                msg_no=msg_no,
+                **fields,
+            )
+            self.stats.incr("retried")
+            self._publish_queues()
+            self._audit(from_callsign, msg_no, message, f"retrying:{error_class}", started)
+            return True, f"Tweet failed ({error_class}), retrying"
+
+        LOG.error(f"Tweet from {from_callsign} failed ({error_class}): {ex!r}")
+        self.stats.incr("failed")
+        self._audit(from_callsign, msg_no, message, f"failed:{error_class}", started)
+        return False, self.retry_policy.reply(error_class, attempt)
+
+    def _async_done(self, from_callsign, message, msg_no, started, tweet_id, error):
+        """Called by the async backend once a queued tweet finished."""
+        if isinstance(error, asyncio.CancelledError):
+            LOG.error(f"Queued tweet from {from_callsign} cancelled by shutdown")
+            self.stats.incr("failed")
+            self._audit(from_callsign, msg_no, message, "cancelled", started)
+            self._reply(from_callsign, "Tweet not sent, aprsd is shutting down")
+            return
+        if error:
+            _, reply = self._tweet_failed(from_callsign, message, 1, error, msg_no, started)
+            self._reply(from_callsign, reply)
+            return
+        self.stats.incr("sent")
+        self._audit(from_callsign, msg_no, message, "sent", started, tweet_id)
+        handle = self.tweet_index.add(from_callsign, tweet_id, message)
+        self._reply(from_callsign, f"Tweet sent! #{handle}")
+
+    def _send_retry(self, entry):
+        """Called from the retry thread when a failed tweet is due again."""
+        self._publish_queues()
+        started = time.monotonic()
+        callsign = entry["callsign"]
+        msg_no = entry.get("msg_no")
+        if entry.get("media"):
+            self._send_map(callsign, attempt=entry["attempt"], digest=entry["media"])
+            return
+        try:
+            handle = self._send_tweet(callsign, entry["text"], msg_no, started)
+        except Exception as ex:
+            retrying, reply = self._tweet_failed(
+                callsign,
+                entry["text"],
+                entry["attempt"],
+                ex,
+                msg_no,
+                started,
+            )
+            if not retrying:
+                self._reply(callsign, reply)
+            return
+
+        if handle is None:
+            self._reply(callsign, "Failed to Auth")
+        else:
+            self._reply(callsign, f"Tweet sent! #{handle}")
+
+    def _send_scheduled(self, entry):
+        """Called from the scheduler thread when a scheduled tweet is due."""
+        self._publish_queues()
+        started = time.monotonic()
+        callsign = entry["callsign"]
+        msg_no = entry.get("msg_no")
+        if self.sinks:
+            self.sinks.publish(self._with_hashtags(entry["text"]), callsign)
+        try:
+            handle = self._send_tweet(callsign, entry["text"], msg_no, started)
+        except Exception as ex:
+            retrying, reply = self._tweet_failed(callsign, entry["text"], 1, ex, msg_no, started)
+            if not retrying:
+                self._reply(callsign, f"Scheduled {reply[0].lower()}{reply[1:]}")
+            return
+
+        if handle is None:
+            self._reply(callsign, f"Scheduled tweet for {_zulu(entry['due'])} failed")
+        else:
+            self._reply(callsign, f"Scheduled tweet sent! #{handle}")
+
+    def _media_state_dir(self):
+        return CONF.aprsd_twitter_plugin.media_state_dir or os.path.join(
+            CONF.save_location,
+            "twitter_media",
+        )
+
+    def _send_map(self, from_callsign, points=None, attempt=1, digest=None):
+        """Render and tweet a track map, runs on the media worker thread.
+
+        Retries pass the ``digest`` of the image kept with the upload
+        state instead of ``points``, so the same upload is resumed.
+        """
+        started = time.monotonic()
+        state_dir = self._media_state_dir()
+        message = f"Recent track of {from_callsign}"
+        if digest:
+            image = media.load_image(state_dir, digest)
+            if image is None:
+                LOG.error(f"Map image {digest} of {from_callsign} is gone, not retrying")
+                self.stats.incr("failed")
+                self._audit(from_callsign, None, message, "failed:expired", started)
+                self._reply(from_callsign, "Map failed, send 'tw map' again")
+                return
+        else:
+            window = CONF.aprsd_twitter_plugin.map_window
+            # A new position changes the image, otherwise reuse the render
+            # for the rest of this time window.
+            key = (from_callsign, int(time.time() // window), points[-1][0], len(points))
+            image = self._render_cache.get(key, functools.partial(media.render_track, points))
+
+        uploader = None
+        try:
+            client = self._get_client()
+            if not client:
+                LOG.error("No twitter client!!")
+                self._audit(from_callsign, None, message, "auth_failed", started)
+                self._reply(from_callsign, "Failed to Auth")
+                return
+            uploader = media.ChunkedUploader(
+                client,
+                state_dir,
+                chunk_size=CONF.aprsd_twitter_plugin.media_chunk_size,
+            )
+            uploader.sweep()
+            media_id = uploader.upload(image)
+            tweet_id = self.twitter.post(self._with_hashtags(message), media_ids=[media_id])
+        except Exception as ex:
+            retrying, reply = self._tweet_failed(
+                from_callsign,
+                message,
+                attempt,
+                ex,
+                started=started,
+                media=media.image_digest(image),
+            )
+            if not retrying and uploader:
+                uploader.discard(image)
+            # retries only report back when they give up
+            if attempt == 1 or not retrying:
+                self._reply(from_callsign, f"Map {reply[0].lower()}{reply[1:]}")
+            return
+
+        self.stats.incr("sent")
+        self._audit(from_callsign, None, message, "sent", started, tweet_id)
+        handle = self.tweet_index.add(from_callsign, tweet_id, message)
+        self._reply(from_callsign, f"Map sent! #{handle}")
+
+    def _process_subcommand(self, from_callsign, cmd, arg):
+        """Answer 'tw last', 'tw status', 'tw del', 'tw map' and 'tw q'."""
+        if cmd == "map":
+            since = time.time() - CONF.aprsd_twitter_plugin.map_window
+            points = self.tracks.track(from_callsign, since=since)
+            if not points:
+                return f"No recent positions for {from_callsign}"
+            self._media_pool.submit(self._send_map, from_callsign, points)
+            return "Rendering map"
+
+        if cmd == "q":
+            pending = self.scheduler.pending(from_callsign) if self.scheduler else []
+            if not pending:
+                return "No tweets queued"
+            return (
+                f"{len(pending)} queued, next {_zulu(pending[0]['due'])} {pending[0]['text'][:30]}"
+            )
+
+        if cmd == "last":
+            handle, entry = self.tweet_index.last(from_callsign)
+            if not entry:
+                return "No tweets sent yet"
+            return f"#{handle} {entry['text'][:50]}"
+
+        if arg is None:
+            if cmd == "del":
+                return "Usage: tw del <n>"
+            arg, entry = self.tweet_index.last(from_callsign)
+            if not entry:
+                return "No tweets sent yet"
+        else:
+            entry = self.tweet_index.get(from_callsign, arg)
+            if not entry:
+                return f"Unknown tweet #{arg}"
+
+        client = self._get_client()
+        if not client:
+            LOG.error("No twitter client!!")
+            return "Failed to Auth"
+
+        try:
+            if cmd == "del":
+                client.destroy_status(entry["id"])
+                self.tweet_index.remove(from_callsign, arg)
+                return f"Deleted #{arg}"
+
+            status = client.get_status(entry["id"])
+        except tweepy.NotFound:
+            self.tweet_index.remove(from_callsign, arg)
+            return f"#{arg} not found, already deleted?"
+        except tweepy.TweepyException as ex:
+            LOG.error(f"Twitter {cmd} of #{arg} failed: {ex}")
+            return f"{cmd} #{arg} failed"
 
-        return "Tweet sent!"
+        return f"#{arg} {status.favorite_count} likes {status.retweet_count} RTs"
@@ -0,0 +1,180 @@
+"""Keep the connection to the Twitter API warm.
+
+The first tweet after startup or after a quiet spell otherwise pays for
+DNS, the TCP connect and a full TLS handshake.  The warmer thread
+creates the client in the background, resolves the API host into a
+small TTL cache and sends a cheap HEAD request through the client's own
+session, so the pooled keep-alive connection (and its TLS session) is
+already open when a tweet has to go out.
+
+The DNS cache is only used by connections of the client's session, via
+``DNSCacheAdapter``; the rest of the process resolves as usual.
+"""
+
+import functools
+import logging
+import socket
+import threading
+import time
+
+from aprsd.threads import APRSDThread
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPSConnection
+from urllib3.connectionpool import HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+
+LOG = logging.getLogger("APRSD")
+
+API_HOST = "api.twitter.com"
+
+
+class DNSCache:
+    """TTL cache of socket.getaddrinfo results for a few hosts.
+
+    Only hosts added with ``add_host()`` are cached, every other lookup
+    goes straight to the resolver.
+    """
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._hosts = set()
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._getaddrinfo = socket.getaddrinfo
+
+    def add_host(self, host):
+        self._hosts.add(host)
+
+    def resolve(self, host, port=443):
+        """Resolve a host now and cache it, returns the addresses."""
+        return self.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        if host not in self._hosts:
+            return self._getaddrinfo(host, port, family, type, proto, flags)
+
+        key = (host, port, family, type, proto, flags)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        result = self._getaddrinfo(host, port, family, type, proto, flags)
+        with self._lock:
+            self._cache[key] = (now + self.ttl, result)
+        return result
+
+
+class _CachedHTTPSConnection(HTTPSConnection):
+    """Connects to the cached addresses, TLS still checks the host name."""
+
+    def __init__(self, *args, dns_cache=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dns_cache = dns_cache
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = self.dns_cache.getaddrinfo(host, self.port, 0, socket.SOCK_STREAM)
+        except OSError:
+            # let urllib3 resolve it and report the error its own way
+            return super()._new_conn()
+
+        error = None
+        for address in dict.fromkeys(info[4][0] for info in addresses):
+            self._dns_host = address
+            try:
+                return super()._new_conn()
+            except ConnectTimeoutError as ex:
+                error = ex
+            finally:
+                self._dns_host = host
+        raise error
+
+
+class _CachedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CachedHTTPSConnection
+
+
+class DNSCacheAdapter(HTTPAdapter):
+    """requests adapter whose connections resolve through a DNSCache.
+
+    Mount it on a session for the hosts that should use the cache.
+    """
+
+    def __init__(self, dns_cache, **kwargs):
+        self.dns_cache = dns_cache
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            **self.poolmanager.pool_classes_by_scheme,
+            "https": functools.partial(_CachedHTTPSConnectionPool, dns_cache=self.dns_cache),
+        }
+
+
+def mount_dns_cache(client, dns_cache, host=API_HOST):
+    """Resolve ``host`` through ``dns_cache`` for the client's session only."""
+    session = getattr(client, "session", None)
+    if session is not None:
+        session.mount(f"https://{host}/", DNSCacheAdapter(dns_cache))
+
+
+class ConnectionWarmer(APRSDThread):
+    """Warm the API connection at startup and probe it when idle.
+
+    ``get_client`` returns the client whose ``session`` should be kept
+    warm (creating it on first use), or None if it can't be created yet.
+    """
+
+    def __init__(self, get_client, interval=240, dns_cache=None, host=API_HOST):
+        super().__init__("TwitterWarmer")
+        self.get_client = get_client
+        self.interval = interval
+        self.dns_cache = dns_cache
+        self.host = host
+        self.warm = False
+        self._last_used = 0.0
+        self._wake = threading.Event()
+
+    def touch(self):
+        """Note that the connection was just used, so no probe is needed."""
+        self._last_used = time.monotonic()
+
+    def stop(self):
+        super().stop()
+        self._wake.set()
+
+    def probe(self):
+        """Resolve the host and refresh the pooled connection.  Never raises."""
+        try:
+            if self.dns_cache:
+                self.dns_cache.resolve(self.host)
+            client = self.get_client()
+            session = getattr(client, "session", None)
+            if session is None:
+                return False
+            session.head(f"https://{self.host}/", timeout=10)
+        except Exception as ex:
+            # The network may simply not be up yet, try again next time.
+            LOG.debug(f"Twitter connection warm-up failed: {ex!r}")
+            self.warm = False
+            return False
+
+        if not self.warm:
+            LOG.info(f"Connection to {self.host} warmed up")
+        self.warm = True
+        self.touch()
+        return True
+
+    def loop(self):
+        idle = time.monotonic() - self._last_used
+        if not self.warm or idle >= self.interval:
+            # retry sooner while the network isn't reachable yet
+            wait = self.interval if self.probe() else min(30, self.interval)
+        else:
+            wait = self.interval - idle
+        self._wake.wait(wait)
+        return not self.thread_stop
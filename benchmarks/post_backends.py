@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Compare the threaded and asyncio posting paths.
+
+Both backends talk to a fake API that only simulates response latency,
+so this measures how well each path overlaps slow requests, not the
+network stack.  With the plugin installed (pip install -e .) run:
+
+    python benchmarks/post_backends.py --posts 200 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from types import SimpleNamespace
+
+from aprsd_twitter_plugin.async_backend import AsyncPostThread
+
+
+class FakeClient:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def update_status(self, text):
+        time.sleep(self.latency)
+        return SimpleNamespace(id=1)
+
+
+class FakeAsyncClient:
+    def __init__(self, latency):
+        self.latency = latency
+
+    async def create_tweet(self, text):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(data={"id": 1})
+
+
+def bench_serial(posts, latency):
+    """The packet thread posting one tweet at a time."""
+    client = FakeClient(latency)
+    for i in range(posts):
+        client.update_status(f"tweet {i}")
+
+
+def bench_threads(posts, latency, concurrency):
+    client = FakeClient(latency)
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        wait([pool.submit(client.update_status, f"tweet {i}") for i in range(posts)])
+
+
+def bench_async(posts, latency, concurrency):
+    poster = AsyncPostThread(client=FakeAsyncClient(latency), max_concurrency=concurrency)
+    poster.start()
+    try:
+        wait([poster.submit(f"tweet {i}") for i in range(posts)])
+    finally:
+        poster.stop()
+        poster.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--posts", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per request")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--serial", action="store_true", help="also time the serial path")
+    args = parser.parse_args()
+
+    runs = [
+        ("threads", lambda: bench_threads(args.posts, args.latency, args.concurrency)),
+        ("asyncio", lambda: bench_async(args.posts, args.latency, args.concurrency)),
+    ]
+    if args.serial:
+        runs.insert(0, ("serial", lambda: bench_serial(args.posts, args.latency)))
+
+    for name, run in runs:
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        print(f"{name:8} {args.posts} posts in {elapsed:.2f}s ({args.posts / elapsed:.1f}/s)")
+
+
+if __name__ == "__main__":
+    main()
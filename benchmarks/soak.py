@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Soak test SendTweetPlugin.process() for memory growth and latency drift.
+
+Synthetic message packets go through the real plugin (content filter,
+tweet index, retry queue, stats) against a local fake Twitter API.
+Every --interval packets the traced memory and the latency percentiles
+of that interval are printed.  The first interval is the warm-up
+baseline; the run fails if memory grew more than --max-growth-kb past
+it, or the p99 of the last interval drifted more than --max-p99-drift
+times the baseline p99.  With the plugin installed (pip install -e .):
+
+    python benchmarks/soak.py --packets 2000000 --mix mixed
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import logging
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+import requests
+import tweepy
+from aprsd import packets
+from oslo_config import cfg
+
+from aprsd_twitter_plugin import twitter
+
+CONF = cfg.CONF
+CALLSIGN = "WB4BOR"
+
+# Traffic mixes: weights of authorized, unauthorized, duplicate and error packets.
+MIXES = {
+    "authorized": {"authorized": 1},
+    "unauthorized": {"unauthorized": 1},
+    "duplicate": {"authorized": 1, "duplicate": 1},
+    "error": {"authorized": 1, "error": 1},
+    "mixed": {"authorized": 7, "unauthorized": 1, "duplicate": 1, "error": 1},
+}
+
+
+def _response(status, code, message):
+    response = requests.Response()
+    response.status_code = status
+    response.reason = message
+    response._content = json.dumps({"errors": [{"code": code, "message": message}]}).encode()
+    return response
+
+
+class FakeAPI:
+    """Answers like tweepy.API without any network.
+
+    Texts containing 'fail' get a 503, texts seen in the last
+    ``remember`` tweets are rejected as duplicates.
+    """
+
+    def __init__(self, remember=1000):
+        self.remember = remember
+        self._ids = itertools.count(1)
+        self._recent = {}
+        self._duplicate = _response(403, 187, "Status is a duplicate.")
+        self._unavailable = _response(503, 130, "Over capacity")
+        self.last_response = SimpleNamespace(
+            headers={"x-rate-limit-remaining": "300", "x-rate-limit-reset": "0"},
+        )
+
+    def update_status(self, text, **kwargs):
+        if "fail" in text:
+            raise tweepy.TwitterServerError(self._unavailable)
+        if text in self._recent:
+            raise tweepy.Forbidden(self._duplicate)
+        self._recent[text] = True
+        if len(self._recent) > self.remember:
+            # dicts keep insertion order, drop the oldest
+            del self._recent[next(iter(self._recent))]
+        return SimpleNamespace(id=next(self._ids))
+
+
+def configure(audit_dir=None):
+    """Point the plugin options at the soak setup, returns the names set."""
+    group = "aprsd_twitter_plugin"
+    overrides = {
+        "callsign": CALLSIGN,
+        "apiKey": "soak",
+        "apiKey_secret": "soak",
+        "access_token": "soak",
+        "access_token_secret": "soak",
+        "add_aprs_hashtag": False,
+        "schedule_enabled": False,
+        "async_backend": False,
+        "stats_enabled": False,
+        "warmup_enabled": False,
+        "retry_max_attempts": 2,
+        "retry_base_delay": 0.001,
+        "retry_max_delay": 0.01,
+        "audit_enabled": bool(audit_dir),
+        "audit_dir": audit_dir,
+    }
+    for name, value in overrides.items():
+        CONF.set_override(name, value, group=group)
+    return list(overrides)
+
+
+def create_plugin(api):
+    plugin = twitter.SendTweetPlugin()
+    plugin._create_client = lambda: api
+    # replies normally go out over APRS
+    plugin._reply = lambda to_call, text: None
+    return plugin
+
+
+def traffic(mix, seed=0):
+    """Yield (from_call, message_text) forever for a traffic mix."""
+    rng = random.Random(seed)
+    kinds, weights = zip(*MIXES[mix].items(), strict=True)
+    for i in itertools.count():
+        kind = rng.choices(kinds, weights)[0]
+        if kind == "unauthorized":
+            yield "N0CALL", f"tw soak {i}"
+        elif kind == "duplicate":
+            yield CALLSIGN, f"tw soak {max(0, i - 1)}"
+        elif kind == "error":
+            yield CALLSIGN, f"tw soak fail {i}"
+        else:
+            yield CALLSIGN, f"tw soak {i}"
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def soak(plugin, total, interval, mix="mixed", on_sample=None, out=sys.stdout):
+    """Push ``total`` packets through ``plugin``.
+
+    Returns a list of samples, one per interval, each with the packet
+    count, traced memory in bytes and p50/p99/max latency in seconds.
+    ``on_sample(sample)`` is called after each one.
+    """
+    samples = []
+    latencies = []
+    source = traffic(mix)
+    for count in range(1, total + 1):
+        from_call, text = next(source)
+        packet = packets.MessagePacket(
+            from_call=from_call,
+            to_call="APRSD",
+            message_text=text,
+            msgNo=str(count % 1000),
+        )
+        start = time.perf_counter()
+        plugin.process(packet)
+        latencies.append(time.perf_counter() - start)
+
+        if count % interval == 0 or count == total:
+            latencies.sort()
+            sample = {
+                "packets": count,
+                "p50": percentile(latencies, 0.50),
+                "p99": percentile(latencies, 0.99),
+                "max": latencies[-1],
+            }
+            latencies = []
+            gc.collect()
+            sample["memory"] = tracemalloc.get_traced_memory()[0]
+            samples.append(sample)
+            print(
+                f"{count:>10} packets  mem {sample['memory'] / 1024:>9.1f}KB  "
+                f"p50 {sample['p50'] * 1e6:>7.1f}us  p99 {sample['p99'] * 1e6:>7.1f}us  "
+                f"max {sample['max'] * 1e3:>7.2f}ms",
+                file=out,
+            )
+            if on_sample:
+                on_sample(sample)
+    return samples
+
+
+def check(samples, max_growth_kb, max_p99_drift, p99_floor_us=20.0):
+    """Compare the last sample to the first (warm-up) one, returns failures."""
+    if len(samples) < 2:
+        return ["need at least two intervals, lower --interval"]
+    baseline, last = samples[0], samples[-1]
+    failures = []
+    growth = (last["memory"] - baseline["memory"]) / 1024
+    if growth > max_growth_kb:
+        failures.append(f"memory grew {growth:.1f}KB (limit {max_growth_kb}KB)")
+    # a small absolute floor keeps microsecond jitter from failing the run
+    limit = baseline["p99"] * max_p99_drift + p99_floor_us / 1e6
+    if last["p99"] > limit:
+        failures.append(
+            f"p99 drifted from {baseline['p99'] * 1e6:.1f}us to {last['p99'] * 1e6:.1f}us "
+            f"(limit {limit * 1e6:.1f}us)",
+        )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--packets", type=int, default=1_000_000)
+    parser.add_argument("--interval", type=int, default=100_000, help="packets per sample")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--max-growth-kb", type=float, default=1024)
+    parser.add_argument("--max-p99-drift", type=float, default=1.5, help="ratio to baseline")
+    parser.add_argument("--audit-dir", help="also write the audit log to this directory")
+    parser.add_argument("--top", type=int, default=10, help="allocation sites to show")
+    args = parser.parse_args()
+
+    # the error mixes would otherwise print a line per failed tweet
+    logging.getLogger("APRSD").setLevel(logging.CRITICAL)
+    configure(args.audit_dir)
+    tracemalloc.start()
+    plugin = create_plugin(FakeAPI())
+    snapshots = []
+
+    def take_snapshot(sample):
+        # the first interval warms caches and the tweet index, compare to
+        # the snapshot after it
+        if not snapshots or sample["packets"] >= args.packets:
+            snapshots.append(tracemalloc.take_snapshot())
+
+    try:
+        samples = soak(plugin, args.packets, args.interval, args.mix, on_sample=take_snapshot)
+    finally:
+        plugin.stop_threads()
+    baseline, final = snapshots[0], snapshots[-1]
+
+    print(f"\nTop {args.top} allocation sites by growth since warm-up:")
+    for stat in final.compare_to(baseline, "lineno")[: args.top]:
+        print(f"  {stat}")
+
+    failures = check(samples, args.max_growth_kb, args.max_p99_drift)
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if not failures:
+        print("PASS")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,20 @@
 
 """Tests for `aprsd_twitter_plugin` package."""
 
+import asyncio
+import socket
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 import pytest
+import requests
+import tweepy
+from aprsd import packets
+from aprsd import plugin as aprsd_plugin
+from aprsd.packets import collector
 
-from aprsd_twitter_plugin.twitter import SendTweetPlugin
+from aprsd_twitter_plugin import warmup
+from aprsd_twitter_plugin.twitter import SendTweetPlugin, parse_command
 
 
 @pytest.fixture
@@ -20,6 +29,30 @@ def mock_conf():
     conf.aprsd_twitter_plugin.access_token_secret = "test_access_secret"
     conf.aprsd_twitter_plugin.bearer_token = "test_bearer_token"
     conf.aprsd_twitter_plugin.add_aprs_hashtag = True
+    conf.aprsd_twitter_plugin.content_filter_enabled = True
+    conf.aprsd_twitter_plugin.content_filter_blocklist = None
+    conf.aprsd_twitter_plugin.content_filter_pii = True
+    conf.aprsd_twitter_plugin.content_filter_reload_interval = 60
+    conf.aprsd_twitter_plugin.tweet_index_file = None
+    conf.aprsd_twitter_plugin.tweet_index_size = 20
+    conf.aprsd_twitter_plugin.schedule_enabled = False
+    conf.aprsd_twitter_plugin.schedule_file = None
+    conf.aprsd_twitter_plugin.async_backend = False
+    conf.aprsd_twitter_plugin.retry_max_attempts = 3
+    conf.aprsd_twitter_plugin.retry_base_delay = 2.0
+    conf.aprsd_twitter_plugin.retry_max_delay = 300.0
+    conf.aprsd_twitter_plugin.stats_enabled = False
+    conf.aprsd_twitter_plugin.warmup_enabled = False
+    conf.aprsd_twitter_plugin.map_track_points = 500
+    conf.aprsd_twitter_plugin.map_window = 7200
+    conf.aprsd_twitter_plugin.map_max_callsigns = 1000
+    conf.aprsd_twitter_plugin.media_chunk_size = 1024
+    conf.aprsd_twitter_plugin.media_state_dir = None
+    conf.aprsd_twitter_plugin.sinks = []
+    conf.aprsd_twitter_plugin.sink_concurrency = 2
+    conf.aprsd_twitter_plugin.sink_max_pending = 100
+    conf.aprsd_twitter_plugin.sink_timeout = 10
+    conf.aprsd_twitter_plugin.audit_enabled = False
     return conf
 
 
@@ -28,7 +61,8 @@ def plugin(mock_conf):
     """Create a plugin instance with mocked config."""
     with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
         plugin_instance = SendTweetPlugin()
-        return plugin_instance
+    yield plugin_instance
+    plugin_instance.stop_threads()
 
 
 @pytest.fixture
@@ -57,7 +91,7 @@ class TestSendTweetPlugin:
         """Test the help method returns correct help text."""
         help_text = plugin.help()
         assert isinstance(help_text, list)
-        assert len(help_text) == 2
+        assert len(help_text) == 5
         assert "twitter: Send a Tweet!!" in help_text
         assert "twitter: Format 'tw <message>'" in help_text
 
@@ -67,6 +101,7 @@ class TestSendTweetPlugin:
             plugin = SendTweetPlugin()
             plugin.setup()
             assert plugin.enabled is True
+            plugin.stop_threads()
 
     def test_setup_missing_callsign(self, mock_conf):
         """Test setup method when callsign is missing."""
@@ -144,7 +179,7 @@ class TestSendTweetPlugin:
             with patch.object(plugin, "_create_client", return_value=mock_client):
                 result = plugin.process(mock_packet)
 
-        assert result == "Tweet sent!"
+        assert result == "Tweet sent! #1"
         mock_client.update_status.assert_called_once()
         # Check that the message was parsed correctly (command removed)
         call_args = mock_client.update_status.call_args[0][0]
@@ -176,7 +211,7 @@ class TestSendTweetPlugin:
             with patch.object(plugin, "_create_client", return_value=mock_client):
                 result = plugin.process(packet)
 
-        assert result == "Tweet sent!"
+        assert result == "Tweet sent! #1"
         mock_client.update_status.assert_called_once()
 
     def test_process_client_creation_failure(self, plugin, mock_packet, mock_conf):
@@ -246,7 +281,7 @@ class TestSendTweetPlugin:
             with patch.object(plugin, "_create_client", return_value=mock_client):
                 result = plugin.process(packet)
 
-        assert result == "Tweet sent!"
+        assert result == "Tweet sent! #1"
         call_args = mock_client.update_status.call_args[0][0]
         assert "This is another test" in call_args
         # Check that command prefix "twitter " is removed
@@ -292,3 +327,427 @@ class TestSendTweetPlugin:
             mock_conf.aprsd_twitter_plugin.access_token,
             mock_conf.aprsd_twitter_plugin.access_token_secret,
         )
+
+    def test_process_blocked_by_content_filter(self, plugin, mock_conf):
+        """Test that messages with personal data are never tweeted."""
+        packet = MagicMock()
+        packet.from_call = "WB4BOR"
+        packet.message_text = "tw call me at 555-123-4567"
+        mock_client = MagicMock()
+
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            with patch.object(plugin, "_create_client", return_value=mock_client):
+                result = plugin.process(packet)
+
+        assert result == "Tweet blocked by content filter"
+        mock_client.update_status.assert_not_called()
+        assert plugin.content_filter.stats() == {"pii:phone": 1}
+
+    @pytest.mark.parametrize(
+        "message,expected",
+        [
+            ("tw last", ("last", None, None)),
+            ("TW Q", ("q", None, None)),
+            ("tw map", ("map", None, None)),
+            ("tw status", ("status", None, None)),
+            ("tw status 3", ("status", 3, None)),
+            ("twitter del 12 ", ("del", 12, None)),
+            ("tw last night was fun", (None, None, "last night was fun")),
+            ("tw status update", (None, None, "status update")),
+            ("tw q 4", (None, None, "q 4")),
+            ("tw", (None, None, "")),
+        ],
+    )
+    def test_parse_command(self, message, expected):
+        """Test that subcommands only match their exact shape."""
+        assert parse_command(message) == expected
+
+    def _send(self, plugin, mock_conf, text, client):
+        packet = MagicMock()
+        packet.from_call = "WB4BOR"
+        packet.message_text = text
+        packet.msgNo = "1"
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            with patch.object(plugin, "_create_client", return_value=client):
+                return plugin.process(packet)
+
+    def test_subcommand_last(self, plugin, mock_conf):
+        """Test 'tw last' answers from the local index."""
+        client = MagicMock()
+        assert self._send(plugin, mock_conf, "tw last", client) == "No tweets sent yet"
+        self._send(plugin, mock_conf, "tw first", client)
+        self._send(plugin, mock_conf, "tw second", client)
+        assert self._send(plugin, mock_conf, "tw last", client) == "#2 second"
+
+    def test_subcommand_delete(self, plugin, mock_conf):
+        """Test 'tw del <n>' deletes the indexed tweet with one API call."""
+        client = MagicMock()
+        client.update_status.return_value.id = 1234
+        self._send(plugin, mock_conf, "tw hello", client)
+
+        assert self._send(plugin, mock_conf, "tw del 1", client) == "Deleted #1"
+        client.destroy_status.assert_called_once_with(1234)
+        assert self._send(plugin, mock_conf, "tw del 1", client) == "Unknown tweet #1"
+        assert self._send(plugin, mock_conf, "tw del", client) == "Usage: tw del <n>"
+
+    def test_subcommand_status(self, plugin, mock_conf):
+        """Test 'tw status' looks up the last tweet."""
+        client = MagicMock()
+        client.update_status.return_value.id = 99
+        client.get_status.return_value.favorite_count = 5
+        client.get_status.return_value.retweet_count = 2
+        self._send(plugin, mock_conf, "tw hello", client)
+
+        assert self._send(plugin, mock_conf, "tw status", client) == "#1 5 likes 2 RTs"
+        client.get_status.assert_called_once_with(99)
+
+    def test_subcommand_handle_zero(self, plugin, mock_conf):
+        """Test that handle 0 is reported as unknown, not as no tweets."""
+        client = MagicMock()
+        self._send(plugin, mock_conf, "tw hello", client)
+        assert self._send(plugin, mock_conf, "tw del 0", client) == "Unknown tweet #0"
+        assert self._send(plugin, mock_conf, "tw status 0", client) == "Unknown tweet #0"
+
+    def test_subcommand_api_error(self, plugin, mock_conf):
+        """Test that API errors are answered instead of raised into APRSD."""
+        client = MagicMock()
+        client.destroy_status.side_effect = tweepy.TweepyException("network down")
+        self._send(plugin, mock_conf, "tw hello", client)
+        assert self._send(plugin, mock_conf, "tw del 1", client) == "del #1 failed"
+        assert plugin.tweet_index.get("WB4BOR", 1) is not None
+
+    def test_subcommand_unauthorized(self, plugin, mock_conf):
+        """Test that subcommands need an authorized callsign too."""
+        packet = MagicMock()
+        packet.from_call = "N0CALL"
+        packet.message_text = "tw del 1"
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            assert plugin.process(packet) == "N0CALL not authorized to tweet!"
+
+    def test_process_schedule(self, mock_conf, tmp_path):
+        """Test that 'tw @HHMMZ <message>' queues the tweet instead of sending it."""
+        mock_conf.aprsd_twitter_plugin.schedule_enabled = True
+        mock_conf.aprsd_twitter_plugin.schedule_file = str(tmp_path / "schedule.journal")
+        client = MagicMock()
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            plugin = SendTweetPlugin()
+        try:
+            result = self._send(plugin, mock_conf, "tw @1800Z Net starts on 146.52", client)
+            assert result == "Tweet scheduled for 1800Z"
+            client.update_status.assert_not_called()
+            assert self._send(plugin, mock_conf, "tw q", client) == (
+                "1 queued, next 1800Z Net starts on 146.52"
+            )
+        finally:
+            plugin.stop_threads()
+
+    def test_process_schedule_disabled(self, plugin, mock_conf):
+        """Test scheduling is refused when the scheduler isn't running."""
+        result = self._send(plugin, mock_conf, "tw @1800Z Net starts", MagicMock())
+        assert result == "Scheduling is disabled"
+
+    def test_send_scheduled(self, plugin, mock_conf):
+        """Test that a due entry is posted and the operator is told."""
+        client = MagicMock()
+        entry = {"id": 1, "due": 0, "callsign": "WB4BOR", "text": "Net starts"}
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            with patch.object(plugin, "_create_client", return_value=client):
+                with patch.object(plugin, "_reply") as reply:
+                    plugin._send_scheduled(entry)
+
+        assert client.update_status.call_args[0][0].startswith("Net starts")
+        reply.assert_called_once_with("WB4BOR", "Scheduled tweet sent! #1")
+
+    def test_process_async_backend(self, plugin, mock_conf):
+        """Test that the async backend queues the tweet and replies later."""
+        plugin.async_poster = MagicMock()
+        result = self._send(plugin, mock_conf, "tw This is a test tweet", MagicMock())
+        assert result == "Tweet queued"
+        text, callback = plugin.async_poster.submit.call_args[0]
+        assert text.startswith("This is a test tweet #aprs")
+
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            with patch.object(plugin, "_reply") as reply:
+                callback(1234, None)
+                callback(None, ValueError("boom"))
+        assert plugin.tweet_index.get("WB4BOR", 1)["id"] == 1234
+        assert [c[0] for c in reply.call_args_list] == [
+            ("WB4BOR", "Tweet sent! #1"),
+            ("WB4BOR", "Tweet failed"),
+        ]
+
+    def _http_error(self, cls, status, errors):
+        response = MagicMock()
+        response.status_code = status
+        response.reason = "Error"
+        response.json.return_value = {"errors": errors}
+        return cls(response)
+
+    def test_process_transient_error_retries(self, plugin, mock_conf):
+        """Test that a 5xx is retried from the retry queue, not the packet thread."""
+        client = MagicMock()
+        client.update_status.side_effect = self._http_error(
+            tweepy.TwitterServerError,
+            503,
+            [{"code": 130, "message": "Over capacity"}],
+        )
+        plugin.retry_queue = MagicMock()
+
+        result = self._send(plugin, mock_conf, "tw hello", client)
+
+        assert result == "Tweet failed (transient), retrying"
+        assert client.update_status.call_count == 1
+        due, callsign, text = plugin.retry_queue.schedule.call_args[0]
+        assert (callsign, text) == ("WB4BOR", "hello")
+        assert plugin.retry_queue.schedule.call_args[1] == {"attempt": 2, "msg_no": "1"}
+        assert plugin.retry_policy.stats()["transient"] == 1
+
+    def test_process_duplicate_fails_fast(self, plugin, mock_conf):
+        """Test that a duplicate status isn't retried."""
+        client = MagicMock()
+        client.update_status.side_effect = self._http_error(
+            tweepy.Forbidden,
+            403,
+            [{"code": 187, "message": "Status is a duplicate."}],
+        )
+        plugin.retry_queue = MagicMock()
+
+        result = self._send(plugin, mock_conf, "tw hello", client)
+
+        assert result == "Tweet failed: duplicate of a recent tweet"
+        plugin.retry_queue.schedule.assert_not_called()
+        assert plugin.retry_policy.stats()["duplicate"] == 1
+
+    def test_send_retry_gives_up(self, plugin, mock_conf):
+        """Test that the last retry tells the operator it gave up."""
+        client = MagicMock()
+        client.update_status.side_effect = tweepy.TweepyException("Failed to send request")
+        plugin.retry_queue = MagicMock()
+        entry = {"id": 1, "due": 0, "callsign": "WB4BOR", "text": "hello", "attempt": 3}
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            with patch.object(plugin, "_create_client", return_value=client):
+                with patch.object(plugin, "_reply") as reply:
+                    plugin._send_retry(entry)
+
+        plugin.retry_queue.schedule.assert_not_called()
+        reply.assert_called_once_with("WB4BOR", "Tweet failed after 3 tries")
+        assert plugin.retry_policy.stats()["gave_up"] == 1
+        published = plugin.stats.read()
+        assert (published["failed"], published["transient"]) == (1, 1)
+        assert published["last_error"] == "transient: Failed to send request"
+
+    def test_stats_published(self, plugin, mock_conf):
+        """Test that sends and blocks show up in the stats mapping."""
+        client = MagicMock()
+        client.last_response.headers = {
+            "x-rate-limit-remaining": "42",
+            "x-rate-limit-reset": "1700000000",
+        }
+        self._send(plugin, mock_conf, "tw hello", client)
+        self._send(plugin, mock_conf, "tw call 555-123-4567", client)
+        published = plugin.stats.read()
+        assert (published["sent"], published["blocked"]) == (1, 1)
+        assert published["rate_limit_remaining"] == 42
+        assert published["rate_limit_reset"] == 1700000000
+
+    def test_client_is_reused(self, plugin, mock_conf):
+        """Test that one client (and its HTTP session) is shared between tweets."""
+        client = MagicMock()
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            with patch.object(plugin, "_create_client", return_value=client) as create:
+                plugin._send_tweet("WB4BOR", "one")
+                plugin._send_tweet("WB4BOR", "two")
+        create.assert_called_once()
+
+    def test_warmup_dns_cache_is_session_only(self, mock_conf):
+        """Test that the DNS cache never replaces the process wide resolver."""
+        mock_conf.aprsd_twitter_plugin.warmup_enabled = True
+        mock_conf.aprsd_twitter_plugin.dns_cache_ttl = 300
+        mock_conf.aprsd_twitter_plugin.warmup_interval = 240
+        original = socket.getaddrinfo
+        # the warmer threads start right away, keep them off the network
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            with patch.object(warmup.ConnectionWarmer, "probe", return_value=True):
+                plugins = [SendTweetPlugin(), SendTweetPlugin()]
+                for plugin in plugins:
+                    plugin.stop_threads()
+        assert socket.getaddrinfo is original
+
+        client = SimpleNamespace(session=requests.Session())
+        with patch.object(plugins[0], "_create_client", return_value=client):
+            plugins[0]._get_client()
+        adapter = client.session.get_adapter("https://api.twitter.com/1.1/")
+        assert isinstance(adapter, warmup.DNSCacheAdapter)
+        assert adapter.dns_cache is plugins[0]._dns_cache
+
+    def test_client_dropped_on_auth_error(self, plugin, mock_conf):
+        """Test that an auth failure forces a new login next time."""
+        plugin._client = MagicMock()
+        response = MagicMock(status_code=401, reason="Unauthorized")
+        response.json.return_value = {}
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            plugin._tweet_failed("WB4BOR", "hello", 1, tweepy.Unauthorized(response))
+        assert plugin._client is None
+
+    def test_positions_reach_map_through_aprsd(self, plugin, mock_conf):
+        """Test that a beacon received by aprsd is drawn by 'tw map'."""
+        pm = aprsd_plugin.PluginManager()
+        pm.register_msg(plugin)
+        beacon = packets.BeaconPacket(
+            from_call="WB4BOR",
+            to_call="APRS",
+            latitude=37.5,
+            longitude=-77.4,
+        )
+        request = packets.MessagePacket(
+            from_call="WB4BOR",
+            to_call=aprsd_plugin.CONF.callsign,
+            message_text="tw map",
+            msgNo="1",
+        )
+        try:
+            with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+                with patch.object(plugin._media_pool, "submit") as submit:
+                    # what the rx and process threads do with each packet
+                    collector.PacketCollector().rx(beacon)
+                    pm.run_watchlist(beacon)
+                    collector.PacketCollector().rx(request)
+                    replies = pm.run(request)
+        finally:
+            pm._pluggy_pm.unregister(plugin)
+
+        assert "Rendering map" in replies
+        _, callsign, points = submit.call_args.args
+        assert callsign == "WB4BOR"
+        assert [p[1:] for p in points] == [(37.5, -77.4)]
+
+    def test_map_without_positions(self, plugin, mock_conf):
+        """Test 'tw map' with no track to draw."""
+        result = self._send(plugin, mock_conf, "tw map", MagicMock())
+        assert result == "No recent positions for WB4BOR"
+
+    def test_map_renders_in_background(self, plugin, mock_conf, tmp_path):
+        """Test 'tw map' uploads the rendered track and tweets it."""
+        mock_conf.aprsd_twitter_plugin.media_state_dir = str(tmp_path)
+        plugin.tracks.add("WB4BOR", 37.50, -77.40)
+        plugin.tracks.add("WB4BOR", 37.52, -77.43)
+        client = MagicMock()
+        client.chunked_upload_init.return_value = MagicMock(
+            media_id_string="77",
+            expires_after_secs=3600,
+        )
+        client.update_status.return_value = MagicMock(id=1234)
+        with patch.object(plugin, "_reply") as reply:
+            with patch.object(plugin._media_pool, "submit") as submit:
+                assert self._send(plugin, mock_conf, "tw map", client) == "Rendering map"
+            func, *args = submit.call_args.args
+            with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+                with patch.object(plugin, "_create_client", return_value=client):
+                    func(*args)
+
+        assert client.update_status.call_args.kwargs == {"media_ids": ["77"]}
+        client.chunked_upload_finalize.assert_called_once_with("77")
+        reply.assert_called_once_with("WB4BOR", "Map sent! #1")
+        assert list(tmp_path.iterdir()) == []
+
+    def test_map_upload_failure(self, plugin, mock_conf, tmp_path):
+        """Test that a failed map upload is retried and resumes the same upload."""
+        mock_conf.aprsd_twitter_plugin.media_state_dir = str(tmp_path)
+        client = MagicMock()
+        client.chunked_upload_init.return_value = MagicMock(
+            media_id_string="77",
+            expires_after_secs=3600,
+        )
+        failures = [tweepy.TweepyException("Failed to send request")]
+
+        def append(media_id, chunk, segment):
+            if segment == 1 and failures:
+                raise failures.pop()
+
+        client.chunked_upload_append.side_effect = append
+        client.update_status.return_value = MagicMock(id=1234)
+        points = [(1.0, 37.5, -77.4), (2.0, 37.6, -77.5)]
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            with patch.object(plugin, "_create_client", return_value=client):
+                with patch.object(plugin, "_reply") as reply:
+                    with patch.object(plugin.retry_queue, "schedule") as schedule:
+                        plugin._send_map("WB4BOR", points)
+                    reply.assert_called_once_with(
+                        "WB4BOR",
+                        "Map tweet failed (transient), retrying",
+                    )
+                    client.update_status.assert_not_called()
+                    entry = {**schedule.call_args.kwargs, "callsign": "WB4BOR"}
+                    assert entry["attempt"] == 2
+
+                    plugin._send_retry(entry)
+
+        client.chunked_upload_init.assert_called_once()
+        segments = [c.args[2] for c in client.chunked_upload_append.call_args_list]
+        assert segments[:3] == [0, 1, 1]
+        assert segments[3:] == list(range(2, len(segments) - 1))
+        reply.assert_called_with("WB4BOR", "Map sent! #1")
+        assert list(tmp_path.iterdir()) == []
+
+    def test_map_gives_up(self, plugin, mock_conf, tmp_path):
+        """Test that a map that can't be sent leaves no upload state behind."""
+        mock_conf.aprsd_twitter_plugin.media_state_dir = str(tmp_path)
+        client = MagicMock()
+        response = MagicMock(status_code=403, reason="Forbidden")
+        response.json.return_value = {}
+        client.chunked_upload_init.side_effect = tweepy.Forbidden(response)
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            with patch.object(plugin, "_create_client", return_value=client):
+                with patch.object(plugin, "_reply") as reply:
+                    plugin._send_map("WB4BOR", [(1.0, 37.5, -77.4)])
+
+        reply.assert_called_once_with("WB4BOR", "Map tweet failed: rejected by Twitter")
+        assert plugin.stats.read()["failed"] == 1
+        assert list(tmp_path.iterdir()) == []
+
+    def test_extra_sinks_get_a_copy(self, mock_conf, tmp_path):
+        """Test that configured sinks receive every tweet in the background."""
+        sink_file = tmp_path / "out.jsonl"
+        mock_conf.aprsd_twitter_plugin.sinks = ["file", "webhook"]
+        mock_conf.aprsd_twitter_plugin.sink_file = str(sink_file)
+        mock_conf.aprsd_twitter_plugin.webhook_url = None
+        mock_conf.aprsd_twitter_plugin.add_aprs_hashtag = False
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            plugin = SendTweetPlugin()
+        try:
+            # the webhook has no url, so only the file sink is used
+            assert list(plugin.sinks.stats()) == ["file"]
+            client = MagicMock()
+            client.update_status.side_effect = tweepy.Forbidden(MagicMock(status_code=403))
+            result = self._send(plugin, mock_conf, "tw hello", client)
+            assert result == "Tweet failed: rejected by Twitter"
+            plugin.sinks.workers[0]._pool.shutdown(wait=True)
+        finally:
+            plugin.stop_threads()
+
+        assert plugin.sinks.stats()["file"]["sent"] == 1
+        assert '"text": "hello"' in sink_file.read_text()
+
+    def test_audit_records_outcomes(self, plugin, mock_conf):
+        """Test that every request is written to the audit log."""
+        plugin.audit = MagicMock()
+        client = MagicMock()
+        client.update_status.return_value.id = 1234
+        self._send(plugin, mock_conf, "tw hello", client)
+        self._send(plugin, mock_conf, "tw call 555-123-4567", client)
+
+        (sent, blocked) = (c.args for c in plugin.audit.record.call_args_list)
+        assert sent[:4] == ("WB4BOR", "1", "hello", "sent")
+        assert sent[5] == 1234
+        assert blocked[3] == "blocked"
+
+    def test_async_cancelled_on_shutdown(self, plugin, mock_conf):
+        """Test that a queued tweet cancelled by shutdown is answered and audited."""
+        plugin.audit = MagicMock()
+        with patch("aprsd_twitter_plugin.twitter.CONF", mock_conf):
+            with patch.object(plugin, "_reply") as reply:
+                plugin._async_done("WB4BOR", "hello", "3", 0.0, None, asyncio.CancelledError())
+
+        reply.assert_called_once_with("WB4BOR", "Tweet not sent, aprsd is shutting down")
+        assert plugin.audit.record.call_args.args[3] == "cancelled"
+        assert plugin.stats.read()["failed"] == 1
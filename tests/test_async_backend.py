@@ -0,0 +1,114 @@
+"""Tests for the `aprsd_twitter_plugin.async_backend` module."""
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from aprsd_twitter_plugin.async_backend import AsyncPostThread
+
+
+class FakeAsyncClient:
+    """Stand-in for tweepy's AsyncClient that records concurrency."""
+
+    def __init__(self, delay=0.05, fail=()):
+        self.delay = delay
+        self.fail = fail
+        self.active = 0
+        self.max_active = 0
+        self.next_id = 100
+
+    async def create_tweet(self, text):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if text in self.fail:
+                raise RuntimeError(f"failed {text}")
+            self.next_id += 1
+            return SimpleNamespace(data={"id": self.next_id})
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def poster_factory():
+    threads = []
+
+    def factory(**kwargs):
+        poster = AsyncPostThread(**kwargs)
+        poster.start()
+        threads.append(poster)
+        return poster
+
+    yield factory
+    for poster in threads:
+        poster.stop()
+        poster.join(5)
+        assert not poster.is_alive()
+
+
+class TestAsyncPostThread:
+    def test_concurrency_limit(self, poster_factory):
+        client = FakeAsyncClient()
+        poster = poster_factory(client=client, max_concurrency=3)
+        futures = [poster.submit(f"tweet {i}") for i in range(10)]
+        ids = sorted(f.result(5) for f in futures)
+        assert ids == list(range(101, 111))
+        assert client.max_active == 3
+
+    def test_callback_and_errors(self, poster_factory):
+        results = []
+        done = threading.Event()
+
+        def callback(tweet_id, error):
+            results.append((tweet_id, error))
+            if len(results) == 2:
+                done.set()
+
+        poster = poster_factory(client=FakeAsyncClient(fail=("bad",)))
+        poster.submit("good", callback)
+        bad = poster.submit("bad", callback)
+        assert done.wait(5)
+        with pytest.raises(RuntimeError):
+            bad.result(5)
+        assert sorted(r[0] or 0 for r in results) == [0, 101]
+        assert any(isinstance(r[1], RuntimeError) for r in results)
+
+    def test_timeout(self, poster_factory):
+        poster = poster_factory(client=FakeAsyncClient(delay=5), timeout=0.1)
+        with pytest.raises(asyncio.TimeoutError):
+            poster.submit("slow").result(5)
+
+    def test_stop_before_start(self):
+        poster = AsyncPostThread(client=FakeAsyncClient())
+        poster.stop()
+        poster.start()
+        poster.join(5)
+        assert not poster.is_alive()
+
+    def test_stop_drains_in_flight(self):
+        results = []
+        poster = AsyncPostThread(client=FakeAsyncClient(delay=0.2), drain_timeout=5)
+        poster.start()
+        poster.submit("draining", lambda tweet_id, error: results.append((tweet_id, error)))
+        time.sleep(0.05)
+        poster.stop()
+        poster.join(5)
+        assert results == [(101, None)]
+
+    def test_stop_cancels_with_callback(self):
+        results = []
+        poster = AsyncPostThread(client=FakeAsyncClient(delay=5), drain_timeout=0.1)
+        poster.start()
+        future = poster.submit("stuck", lambda tweet_id, error: results.append((tweet_id, error)))
+        time.sleep(0.05)
+        poster.stop()
+        poster.join(5)
+        assert not poster.is_alive()
+        ((tweet_id, error),) = results
+        assert tweet_id is None
+        assert isinstance(error, asyncio.CancelledError)
+        assert future.cancelled()
@@ -0,0 +1,155 @@
+"""Tests for the `aprsd_twitter_plugin.audit` module."""
+
+import datetime
+import gzip
+import hashlib
+import json
+import os
+
+import pytest
+
+from aprsd_twitter_plugin import audit, cli
+from aprsd_twitter_plugin.audit import AuditLog
+
+
+def _ts(day, hour=12):
+    return datetime.datetime(2026, 10, day, hour, tzinfo=datetime.UTC).timestamp()
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = AuditLog(str(tmp_path), max_bytes=1024 * 1024, flush_interval=0.01)
+    yield log
+    log.stop()
+
+
+def _write(log, day, callsign, outcome="sent", hour=12):
+    log.record(callsign, "1", "hello", outcome, 0.25, tweet_id=f"{callsign}-{day}")
+    log._queue.queue[-1]["time"] = _ts(day, hour)
+
+
+class TestAuditLog:
+    def test_record_written_in_batches(self, log, tmp_path):
+        log.record("WB4BOR", "7", "hello", "sent", 0.1234, tweet_id=99)
+        log.record("WB4BOR", "8", "again", "failed:auth", 0.5)
+        assert log.loop() is True
+
+        (segment,) = tmp_path.iterdir()
+        assert segment.name.endswith(".jsonl")
+        first, second = (json.loads(line) for line in segment.read_text().splitlines())
+        assert first["callsign"] == "WB4BOR"
+        assert first["msgNo"] == "7"
+        assert first["text_sha256"] == hashlib.sha256(b"hello").hexdigest()
+        assert first["tweet_id"] == 99
+        assert first["latency_ms"] == 123.4
+        assert second["outcome"] == "failed:auth"
+        assert "text" not in first
+
+    def test_rotation_by_size_gzips(self, tmp_path):
+        log = AuditLog(str(tmp_path), max_bytes=1, flush_interval=0.01)
+        for day in (1, 2):
+            _write(log, day, "WB4BOR")
+            log.loop()
+        log.stop()
+
+        names = sorted(p.name for p in tmp_path.iterdir())
+        assert len(names) == 2
+        assert all(name.endswith(".jsonl.gz") for name in names)
+        with gzip.open(tmp_path / names[0], "rt") as fh:
+            assert json.loads(fh.read())["tweet_id"] == "WB4BOR-1"
+
+    def test_rotation_by_age(self, tmp_path):
+        log = AuditLog(str(tmp_path), max_age=0, flush_interval=0.01)
+        _write(log, 1, "WB4BOR")
+        log.loop()
+        assert [p.name[-3:] for p in tmp_path.iterdir()] == [".gz"]
+
+    def test_cleanup_flushes_queue(self, log, tmp_path):
+        for day in range(1, 4):
+            _write(log, day, "WB4BOR")
+        log._cleanup()
+        assert len(list(audit.query(str(tmp_path)))) == 3
+
+    def test_queue_full_drops(self, tmp_path):
+        log = AuditLog(str(tmp_path), max_queue=1)
+        log.record("WB4BOR", "1", "a", "sent", 0)
+        log.record("WB4BOR", "2", "b", "sent", 0)
+        assert log.dropped == 1
+
+    def test_recover_leftover_segment(self, tmp_path):
+        leftover = tmp_path / "audit-20261001T120000.000000Z.jsonl"
+        leftover.write_text(json.dumps({"time": _ts(1), "callsign": "WB4BOR"}) + "\n{torn")
+        log = AuditLog(str(tmp_path), flush_interval=0.01)
+        _write(log, 2, "WB4BOR")
+        log.loop()
+
+        assert not leftover.exists()
+        assert os.path.exists(f"{leftover}.gz")
+        assert [e["callsign"] for e in audit.query(str(tmp_path))] == ["WB4BOR", "WB4BOR"]
+
+
+class TestQuery:
+    @pytest.fixture
+    def directory(self, tmp_path):
+        log = AuditLog(str(tmp_path), max_bytes=1, flush_interval=0.01)
+        for day, callsign in ((1, "WB4BOR"), (2, "N0CALL"), (3, "WB4BOR"), (4, "WB4BOR")):
+            _write(log, day, callsign)
+            log.loop()
+        # the last one stays in an open segment
+        _write(log, 5, "N0CALL")
+        log.flush()
+        return str(tmp_path)
+
+    def test_all(self, directory):
+        assert [e["tweet_id"] for e in audit.query(directory)] == [
+            "WB4BOR-1",
+            "N0CALL-2",
+            "WB4BOR-3",
+            "WB4BOR-4",
+            "N0CALL-5",
+        ]
+
+    def test_callsign_and_range(self, directory):
+        found = audit.query(directory, callsign="WB4BOR", since=_ts(2, 0), until=_ts(4, 0))
+        assert [e["tweet_id"] for e in found] == ["WB4BOR-3"]
+
+    def test_skips_segments_outside_range(self, directory, monkeypatch):
+        opened = []
+        real_open = gzip.open
+
+        def spy(path, *args, **kwargs):
+            opened.append(os.path.basename(path))
+            return real_open(path, *args, **kwargs)
+
+        monkeypatch.setattr(audit.gzip, "open", spy)
+        list(audit.query(directory, since=_ts(3), until=_ts(4, 0)))
+        assert len(opened) == 1
+        assert opened[0].startswith("audit-20261003")
+
+
+class TestAuditCli:
+    def test_parse_time(self):
+        assert cli.parse_time("2026-10-03") == _ts(3, 0)
+        assert cli.parse_time("2026-10-03", end=True) == _ts(4, 0)
+        assert cli.parse_time("2026-10-03T12:00:00") == _ts(3)
+
+    def test_audit_cmd(self, tmp_path, capsys):
+        log = AuditLog(str(tmp_path), flush_interval=0.01)
+        _write(log, 3, "WB4BOR")
+        _write(log, 4, "N0CALL")
+        log.loop()
+
+        assert cli.audit_cmd(str(tmp_path), callsign="wb4bor", since="2026-10-03") == 0
+        (line,) = capsys.readouterr().out.splitlines()
+        assert line.startswith("2026-10-03 12:00:00Z WB4BOR msg 1 sent tweet WB4BOR-3 250.0ms")
+
+        assert cli.audit_cmd(str(tmp_path), until="2026-10-03", as_json=True) == 0
+        (line,) = capsys.readouterr().out.splitlines()
+        assert json.loads(line)["tweet_id"] == "WB4BOR-3"
+
+    def test_bad_date(self, tmp_path, capsys):
+        assert cli.audit_cmd(str(tmp_path), since="yesterday") == 1
+        assert "Error" in capsys.readouterr().err
+
+    def test_missing_dir(self, tmp_path, capsys):
+        assert cli.audit_cmd(str(tmp_path / "missing")) == 1
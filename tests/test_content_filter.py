@@ -0,0 +1,154 @@
+"""Tests for the `aprsd_twitter_plugin.content_filter` module."""
+
+import os
+import threading
+
+import pytest
+
+from aprsd_twitter_plugin import content_filter
+from aprsd_twitter_plugin.content_filter import ContentFilter, compile_terms
+
+
+def _write(path, text):
+    path.write_text(text)
+    # make sure the mtime changes even on coarse-grained filesystems
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+class TestCompileTerms:
+    def test_empty(self):
+        assert compile_terms([]) is None
+        assert compile_terms(["", "  ", "y" * 1200]) is None
+
+    def test_shared_prefixes(self):
+        regex = compile_terms(["spam", "spammer", "span", "sp"])
+        assert [m.group(0) for m in regex.finditer("sp span spammer spam spa")] == [
+            "sp",
+            "span",
+            "spammer",
+            "spam",
+        ]
+
+    def test_word_boundaries_and_case(self):
+        regex = compile_terms(["ass", "bad word"])
+        assert regex.search("first class") is None
+        assert regex.search("what a BAD  word").group(0) == "BAD  word"
+        assert regex.search("Ass!").group(0) == "Ass"
+
+    def test_special_characters(self):
+        regex = compile_terms(["a.b", "c+d", "[x]"])
+        assert regex.search("axb") is None
+        assert regex.search("see a.b now")
+        assert regex.search("c+d")
+
+
+class TestContentFilter:
+    def test_clean_message(self):
+        cf = ContentFilter()
+        assert cf.check("Net starts on 146.520 at 1800Z") == []
+        assert cf.stats() == {}
+
+    def test_pii(self):
+        cf = ContentFilter()
+        assert cf.check("mail me at op@example.com") == ["pii:email"]
+        assert cf.check("ssn 123-45-6789") == ["pii:ssn"]
+        assert cf.check("call (555) 123-4567") == ["pii:phone"]
+        assert cf.stats() == {"pii:email": 1, "pii:ssn": 1, "pii:phone": 1}
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "Net tonight 147.060 2000 local",
+            "APRS 144.390 1200 baud",
+            "442.125 + 100.0 tone 1930 local",
+            "Net on 146.520 simplex 1800 2100",
+            "email me at WB4BOR@winlink.org",
+        ],
+    )
+    def test_ham_radio_not_pii(self, text):
+        assert ContentFilter().check(text) == []
+
+    def test_phone_shapes(self):
+        cf = ContentFilter()
+        for text in ("555-123-4567", "+1 555-123-4567", "1-555-123-4567", "(555)123-4567"):
+            assert cf.check(text) == ["pii:phone"], text
+        assert cf.check("op@winlink.org.example.com") == ["pii:email"]
+
+    def test_pii_disabled(self):
+        cf = ContentFilter(pii=False)
+        assert cf.check("mail me at op@example.com") == []
+
+    def test_blocklist_hits(self, tmp_path):
+        blocklist = tmp_path / "blocklist.txt"
+        blocklist.write_text("# comment\nbadword\nworse word\n\n")
+        cf = ContentFilter(blocklist_path=str(blocklist), pii=False)
+        assert cf.check("a BADWORD and a worse word, badword again") == [
+            "blocklist:badword",
+            "blocklist:worse word",
+        ]
+        cf.check("badword")
+        assert cf.stats() == {"blocklist:badword": 2, "blocklist:worse word": 1}
+
+    def test_reload_keeps_counters(self, tmp_path):
+        blocklist = tmp_path / "blocklist.txt"
+        blocklist.write_text("alpha\nbravo\n")
+        cf = ContentFilter(blocklist_path=str(blocklist), pii=False, reload_interval=0)
+        cf.check("alpha bravo")
+        cf._reloader.join(5)
+
+        _write(blocklist, "alpha\ncharlie\n")
+        # the change is picked up in the background
+        cf.check("nothing")
+        cf._reloader.join(5)
+        assert cf.check("bravo charlie") == ["blocklist:charlie"]
+        # bravo left the blocklist, so its counter went with it
+        assert cf.stats() == {"blocklist:alpha": 1, "blocklist:charlie": 1}
+
+    def test_check_never_waits_for_compile(self, tmp_path, monkeypatch):
+        blocklist = tmp_path / "blocklist.txt"
+        blocklist.write_text("alpha\n")
+        cf = ContentFilter(blocklist_path=str(blocklist), pii=False, reload_interval=0)
+        release = threading.Event()
+        compiling = threading.Event()
+
+        def slow_compile(terms):
+            compiling.set()
+            release.wait(5)
+            return compile_terms(terms)
+
+        monkeypatch.setattr(content_filter, "compile_terms", slow_compile)
+        _write(blocklist, "alpha\nbravo\n")
+        cf.check("start the reload")
+        assert compiling.wait(5)
+        # the old regex keeps answering while the new one compiles
+        assert cf.check("alpha bravo") == ["blocklist:alpha"]
+        release.set()
+        cf._reloader.join(5)
+        assert cf.check("alpha bravo") == ["blocklist:alpha", "blocklist:bravo"]
+
+    def test_reload_unchanged(self, tmp_path):
+        blocklist = tmp_path / "blocklist.txt"
+        blocklist.write_text("alpha\n")
+        cf = ContentFilter(blocklist_path=str(blocklist), pii=False)
+        assert cf.reload() is False
+        _write(blocklist, "# same terms\nalpha\n")
+        assert cf.reload() is False
+
+    def test_hashtags_are_terms(self, tmp_path):
+        blocklist = tmp_path / "blocklist.txt"
+        blocklist.write_text("# comment\n#\n#badtag\nfoo#bar\n")
+        cf = ContentFilter(blocklist_path=str(blocklist), pii=False)
+        assert cf.check("so #BadTag") == ["blocklist:#badtag"]
+        assert cf.check("foo#bar") == ["blocklist:foo#bar"]
+        assert cf.check("comment") == []
+
+    def test_overlong_term_skipped(self, tmp_path):
+        blocklist = tmp_path / "blocklist.txt"
+        blocklist.write_text("x" * 1200 + "\nshort\n")
+        cf = ContentFilter(blocklist_path=str(blocklist), pii=False)
+        assert cf.check("short " + "x" * 1200) == ["blocklist:short"]
+
+    def test_missing_blocklist(self, tmp_path):
+        cf = ContentFilter(blocklist_path=str(tmp_path / "nope.txt"), pii=False)
+        assert cf.check("anything") == []
@@ -0,0 +1,210 @@
+"""Tests for the `aprsd_twitter_plugin.media` module."""
+
+import json
+import os
+import struct
+import time
+import zlib
+from unittest.mock import MagicMock
+
+import pytest
+from aprsd import packets
+
+from aprsd_twitter_plugin.media import (
+    ChunkedUploader,
+    RenderCache,
+    TrackStore,
+    encode_png,
+    image_digest,
+    load_image,
+    render_track,
+)
+
+
+class TestTrackStore:
+    def test_bounded_per_callsign(self):
+        tracks = TrackStore(max_points=3)
+        for i in range(5):
+            tracks.add("WB4BOR", 37.0 + i, -77.0, timestamp=i)
+        tracks.add("N0CALL", 10.0, 10.0, timestamp=1)
+
+        assert [p[0] for p in tracks.track("WB4BOR")] == [2, 3, 4]
+        assert len(tracks.track("N0CALL")) == 1
+        assert tracks.track("UNKNOWN") == []
+
+    def test_since_and_null_positions(self):
+        tracks = TrackStore()
+        tracks.add("WB4BOR", 0, 0, timestamp=5)
+        tracks.add("WB4BOR", 37.0, -77.0, timestamp=10)
+        tracks.add("WB4BOR", 37.1, -77.1, timestamp=20)
+
+        assert tracks.track("WB4BOR", since=15) == [(20, 37.1, -77.1)]
+        assert len(tracks.track("WB4BOR")) == 2
+
+    def test_least_recently_heard_evicted(self):
+        tracks = TrackStore(max_callsigns=2)
+        tracks.add("WB4BOR", 37.0, -77.0)
+        tracks.add("N0CALL", 10.0, 10.0)
+        tracks.add("WB4BOR", 37.1, -77.1)
+        tracks.add("KF4XYZ", 20.0, 20.0)
+
+        assert len(tracks) == 2
+        assert tracks.track("N0CALL") == []
+        assert len(tracks.track("WB4BOR")) == 2
+
+    def test_quiet_callsigns_expire(self):
+        tracks = TrackStore(max_age=60)
+        now = time.time()
+        tracks.add("WB4BOR", 37.0, -77.0, timestamp=now - 120)
+        tracks.add("N0CALL", 10.0, 10.0, timestamp=now)
+
+        assert len(tracks) == 1
+        assert tracks.track("WB4BOR") == []
+
+    def test_rx_positions_only(self):
+        tracks = TrackStore()
+        tracks.rx(packets.BeaconPacket(from_call="WB4BOR", latitude=37.5, longitude=-77.4))
+        tracks.rx(
+            packets.ObjectPacket(from_call="WB4BOR", latitude=10.0, longitude=10.0),
+        )
+        tracks.rx(packets.MessagePacket(from_call="WB4BOR", message_text="hi"))
+
+        assert [p[1:] for p in tracks.track("WB4BOR")] == [(37.5, -77.4)]
+        assert tracks() is tracks
+
+
+def _decode_png(data):
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    offset = 8
+    chunks = {}
+    while offset < len(data):
+        (length,) = struct.unpack_from(">I", data, offset)
+        kind = data[offset + 4 : offset + 8]
+        body = data[offset + 8 : offset + 8 + length]
+        (crc,) = struct.unpack_from(">I", data, offset + 8 + length)
+        assert crc == zlib.crc32(kind + body)
+        chunks[kind] = body
+        offset += 12 + length
+    width, height = struct.unpack_from(">II", chunks[b"IHDR"])
+    return width, height, zlib.decompress(chunks[b"IDAT"])
+
+
+class TestRender:
+    def test_encode_png(self):
+        pixels = bytearray(b"\xff\x00\x00" * 6)
+        width, height, raw = _decode_png(encode_png(pixels, 3, 2))
+        assert (width, height) == (3, 2)
+        assert raw == (b"\0" + b"\xff\x00\x00" * 3) * 2
+
+    def test_render_track(self):
+        points = [(0, 37.50, -77.40), (1, 37.51, -77.42), (2, 37.53, -77.41)]
+        width, height, raw = _decode_png(render_track(points, width=100, height=80))
+        assert (width, height) == (100, 80)
+        assert len(raw) == 80 * (1 + 100 * 3)
+        # start and end markers are drawn
+        assert b"\x00\xa0\x00" in raw
+        assert b"\xdc\x00\x00" in raw
+
+    def test_render_single_point(self):
+        width, height, _ = _decode_png(render_track([(0, 37.5, -77.4)], width=50, height=50))
+        assert (width, height) == (50, 50)
+
+
+class TestRenderCache:
+    def test_hit_and_eviction(self):
+        cache = RenderCache(size=2)
+        render = MagicMock(side_effect=[b"a", b"b", b"c", b"a2"])
+
+        assert cache.get("a", render) == b"a"
+        assert cache.get("a", render) == b"a"
+        cache.get("b", render)
+        cache.get("c", render)
+        # 'a' was the least recently used and got evicted
+        assert cache.get("a", render) == b"a2"
+        assert render.call_count == 4
+
+
+def _api():
+    api = MagicMock()
+    api.chunked_upload_init.return_value = MagicMock(media_id_string="99", expires_after_secs=600)
+    return api
+
+
+class TestChunkedUploader:
+    def test_upload_in_chunks(self, tmp_path):
+        api = _api()
+        data = bytes(range(256)) * 10
+        uploader = ChunkedUploader(api, str(tmp_path), chunk_size=1024)
+
+        assert uploader.upload(data) == "99"
+        api.chunked_upload_init.assert_called_once_with(
+            2560,
+            "image/png",
+            media_category="tweet_image",
+        )
+        appended = [c.args for c in api.chunked_upload_append.call_args_list]
+        assert [(media_id, seg) for media_id, _, seg in appended] == [
+            ("99", 0),
+            ("99", 1),
+            ("99", 2),
+        ]
+        assert b"".join(chunk for _, chunk, _ in appended) == data
+        api.chunked_upload_finalize.assert_called_once_with("99")
+        assert list(tmp_path.iterdir()) == []
+
+    def test_resume_after_interruption(self, tmp_path):
+        api = _api()
+        api.chunked_upload_append.side_effect = [None, ConnectionError("reset"), None, None]
+        data = b"x" * 3000
+        uploader = ChunkedUploader(api, str(tmp_path), chunk_size=1024)
+
+        with pytest.raises(ConnectionError):
+            uploader.upload(data)
+        digest = image_digest(data)
+        state_file = tmp_path / f"{digest}.json"
+        assert json.loads(state_file.read_text())["segment"] == 1
+        # a retry can get the image back without rendering it again
+        assert load_image(str(tmp_path), digest) == data
+
+        assert uploader.upload(data) == "99"
+        api.chunked_upload_init.assert_called_once()
+        segments = [c.args[2] for c in api.chunked_upload_append.call_args_list]
+        assert segments == [0, 1, 1, 2]
+        assert list(tmp_path.iterdir()) == []
+
+    def test_expired_or_bad_state_restarts(self, tmp_path):
+        api = _api()
+        api.chunked_upload_init.return_value.expires_after_secs = -1
+        api.chunked_upload_finalize.side_effect = [ConnectionError("reset"), None]
+        uploader = ChunkedUploader(api, str(tmp_path), chunk_size=1024)
+
+        with pytest.raises(ConnectionError):
+            uploader.upload(b"y" * 100)
+        uploader.upload(b"y" * 100)
+        assert api.chunked_upload_init.call_count == 2
+
+        (tmp_path / "junk.json").write_text("{not json")
+        assert uploader._load_state(str(tmp_path / "junk.json")) is None
+        assert list(tmp_path.iterdir()) == []
+
+    def test_sweep_and_discard(self, tmp_path):
+        api = _api()
+        api.chunked_upload_append.side_effect = ConnectionError("reset")
+        uploader = ChunkedUploader(api, str(tmp_path), chunk_size=1024)
+        for data in (b"a" * 10, b"b" * 10):
+            with pytest.raises(ConnectionError):
+                uploader.upload(data)
+        assert len(list(tmp_path.iterdir())) == 4
+
+        uploader.discard(b"a" * 10)
+        digest = image_digest(b"b" * 10)
+        state_file = tmp_path / f"{digest}.json"
+        state = json.loads(state_file.read_text())
+        state["expires_at"] = 0
+        state_file.write_text(json.dumps(state))
+        old = time.time() - 2 * 86400
+        os.utime(tmp_path / f"{digest}.data", (old, old))
+        (tmp_path / "leftover.json.tmp").write_text("{")
+
+        uploader.sweep()
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["leftover.json.tmp"]
@@ -0,0 +1,88 @@
+"""Tests for the `aprsd_twitter_plugin.retry` module."""
+
+import random
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+import tweepy
+
+from aprsd_twitter_plugin import retry
+
+
+def http_error(cls, status, errors=(), headers=None):
+    response = MagicMock()
+    response.status_code = status
+    response.reason = "Error"
+    response.headers = headers or {}
+    response.json.return_value = {"errors": list(errors)}
+    return cls(response)
+
+
+class TestClassify:
+    @pytest.mark.parametrize(
+        "ex,expected",
+        [
+            (http_error(tweepy.TooManyRequests, 429), retry.RATE_LIMIT),
+            (http_error(tweepy.TwitterServerError, 502), retry.TRANSIENT),
+            (http_error(tweepy.Unauthorized, 401), retry.AUTH),
+            (
+                http_error(tweepy.Forbidden, 403, [{"code": 187, "message": "duplicate"}]),
+                retry.DUPLICATE,
+            ),
+            (
+                http_error(
+                    tweepy.Forbidden,
+                    403,
+                    [{"message": "You are not allowed to create a Tweet with duplicate content."}],
+                ),
+                retry.DUPLICATE,
+            ),
+            (http_error(tweepy.Forbidden, 403, [{"code": 261, "message": "x"}]), retry.AUTH),
+            (
+                http_error(tweepy.BadRequest, 400, [{"code": 186, "message": "long"}]),
+                retry.CONTENT,
+            ),
+            (http_error(tweepy.NotFound, 404), retry.UNKNOWN),
+            (tweepy.TweepyException("Failed to send request"), retry.TRANSIENT),
+            (requests.ConnectionError("reset"), retry.TRANSIENT),
+            (TimeoutError(), retry.TRANSIENT),
+            (ValueError("bug"), retry.UNKNOWN),
+        ],
+    )
+    def test_classify(self, ex, expected):
+        assert retry.classify(ex) == expected
+
+
+class TestRetryPolicy:
+    def test_backoff_is_capped_and_jittered(self):
+        policy = retry.RetryPolicy(base_delay=1, max_delay=10, rng=random.Random(1))
+        delays = [policy.backoff(attempt) for attempt in range(1, 10) for _ in range(20)]
+        assert all(0 <= d <= 10 for d in delays)
+        assert len(set(delays)) == len(delays)
+        assert max(policy.backoff(1) for _ in range(50)) <= 1
+
+    def test_retries_until_max_attempts(self):
+        policy = retry.RetryPolicy(max_attempts=3)
+        ex = http_error(tweepy.TwitterServerError, 500)
+        assert policy.failed(ex, 1)[1] is not None
+        assert policy.failed(ex, 2)[1] is not None
+        assert policy.failed(ex, 3) == (retry.TRANSIENT, None)
+        assert policy.reply(retry.TRANSIENT, 3) == "Tweet failed after 3 tries"
+        stats = policy.stats()
+        assert (stats["transient"], stats["retried"], stats["gave_up"]) == (3, 2, 1)
+
+    def test_fail_fast(self):
+        policy = retry.RetryPolicy()
+        ex = http_error(tweepy.Unauthorized, 401)
+        assert policy.failed(ex, 1) == (retry.AUTH, None)
+        assert policy.reply(retry.AUTH, 1) == "Tweet failed: Twitter auth error"
+
+    def test_rate_limit_waits_for_reset(self):
+        policy = retry.RetryPolicy(base_delay=1, max_delay=600)
+        reset = str(int(time.time()) + 120)
+        ex = http_error(tweepy.TooManyRequests, 429, headers={"x-rate-limit-reset": reset})
+        error_class, delay = policy.failed(ex, 1)
+        assert error_class == retry.RATE_LIMIT
+        assert 100 < delay <= 121
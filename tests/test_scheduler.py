@@ -0,0 +1,114 @@
+"""Tests for the `aprsd_twitter_plugin.scheduler` module."""
+
+import datetime
+import json
+import threading
+import time
+
+import pytest
+
+from aprsd_twitter_plugin.scheduler import TweetScheduler, parse_schedule
+
+NOW = datetime.datetime(2026, 10, 19, 12, 0, tzinfo=datetime.UTC)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / "schedule.journal")
+
+
+def _records(path):
+    with open(path) as fh:
+        return [json.loads(line) for line in fh]
+
+
+class TestParseSchedule:
+    def test_later_today(self):
+        due, text = parse_schedule("@1800Z Net starts on 146.52", now=NOW)
+        assert text == "Net starts on 146.52"
+        assert due == datetime.datetime(2026, 10, 19, 18, 0, tzinfo=datetime.UTC).timestamp()
+
+    def test_wraps_to_tomorrow(self):
+        due, _ = parse_schedule("@1200z past", now=NOW)
+        assert due == datetime.datetime(2026, 10, 20, 12, 0, tzinfo=datetime.UTC).timestamp()
+
+    @pytest.mark.parametrize("text", ["Net starts", "@2400Z bad hour", "@1860Z bad", "@1800Z"])
+    def test_not_a_schedule(self, text):
+        assert parse_schedule(text, now=NOW) == (None, text)
+
+
+class TestTweetScheduler:
+    def test_pending_order(self):
+        sched = TweetScheduler(lambda entry: None)
+        sched.schedule(300, "WB4BOR", "late")
+        sched.schedule(100, "WB4BOR", "early")
+        sched.schedule(200, "N0CALL", "other")
+        assert [e["text"] for e in sched.pending("WB4BOR")] == ["early", "late"]
+        assert sched.pending_count() == 3
+
+    def test_cancel(self):
+        sched = TweetScheduler(lambda entry: None)
+        item_id = sched.schedule(100, "WB4BOR", "one")
+        assert sched.cancel(item_id) is True
+        assert sched.cancel(item_id) is False
+        assert sched.pending() == []
+
+    def test_journal_replay(self, journal):
+        sched = TweetScheduler(lambda entry: None, path=journal)
+        first = sched.schedule(100, "WB4BOR", "one")
+        sched.schedule(200, "WB4BOR", "two")
+        sched.cancel(first)
+        sched._cleanup()
+
+        reloaded = TweetScheduler(lambda entry: None, path=journal)
+        assert [e["text"] for e in reloaded.pending()] == ["two"]
+        # ids keep counting after the replayed ones
+        assert reloaded.schedule(300, "WB4BOR", "three") == 3
+        # the journal was compacted on load
+        assert [r["op"] for r in _records(journal)] == ["add", "add"]
+
+    def test_journal_skips_bad_records(self, journal):
+        with open(journal, "w") as fh:
+            fh.write(json.dumps({"op": "add", "id": 1, "entry": {"due": 1, "text": "ok"}}) + "\n")
+            fh.write("[]\n")
+            fh.write(json.dumps({"op": "add", "id": 2}) + "\n")
+            fh.write('{"op": "add", "id": 3, "ent')
+        sched = TweetScheduler(lambda entry: None, path=journal)
+        assert [e["text"] for e in sched.pending()] == ["ok"]
+
+    def test_compaction(self, journal):
+        sched = TweetScheduler(lambda entry: None, path=journal)
+        sched.compact_min = 2
+        ids = [sched.schedule(100 + i, "WB4BOR", str(i)) for i in range(4)]
+        for item_id in ids[:3]:
+            sched.cancel(item_id)
+        assert len(_records(journal)) == 1
+
+    def test_unwritable_journal(self, tmp_path):
+        with pytest.raises(OSError):
+            TweetScheduler(lambda entry: None, path=str(tmp_path / "missing" / "journal"))
+
+    def test_loop_fires_due_entries(self, journal):
+        fired = []
+        done = threading.Event()
+
+        def callback(entry):
+            fired.append(entry["text"])
+            if len(fired) == 2:
+                done.set()
+
+        sched = TweetScheduler(callback, path=journal)
+        sched.start()
+        try:
+            sched.schedule(time.time() + 60, "WB4BOR", "later")
+            # an earlier entry wakes the sleeping thread
+            sched.schedule(time.time() + 0.05, "WB4BOR", "second")
+            sched.schedule(time.time() - 1, "WB4BOR", "first")
+            assert done.wait(5)
+        finally:
+            sched.stop()
+            sched.join(5)
+
+        assert fired == ["first", "second"]
+        assert not sched.is_alive()
+        assert [e["text"] for e in TweetScheduler(callback, path=journal).pending()] == ["later"]
@@ -0,0 +1,193 @@
+"""Tests for the `aprsd_twitter_plugin.sinks` module."""
+
+import http.server
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import pytest
+import requests
+
+from aprsd_twitter_plugin.sinks import (
+    FileSink,
+    MastodonSink,
+    Sink,
+    SinkDispatcher,
+    SinkWorker,
+    TweepySink,
+    WebhookSink,
+)
+
+
+class StandIn(http.server.ThreadingHTTPServer):
+    """Local HTTP server that records requests and answers with ``status``."""
+
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), StandInHandler)
+        self.requests = []
+        self.status = 200
+        self.delay = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class StandInHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((self.path, dict(self.headers), json.loads(body)))
+        time.sleep(self.server.delay)
+        payload = json.dumps({"id": str(len(self.server.requests))}).encode()
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = StandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class SlowSink(Sink):
+    name = "slow"
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def post(self, text, callsign=None):
+        self.release.wait(5)
+        return "slow"
+
+
+class FailingSink(Sink):
+    name = "broken"
+
+    def __init__(self):
+        self.calls = 0
+
+    def post(self, text, callsign=None):
+        self.calls += 1
+        raise ConnectionError("refused")
+
+
+class TestSinks:
+    def test_tweepy_sink(self):
+        client = MagicMock()
+        client.update_status.return_value.id = 123
+        sink = TweepySink(lambda: client)
+
+        assert sink.post("hello", media_ids=["9"]) == 123
+        client.update_status.assert_called_once_with("hello", media_ids=["9"])
+        assert sink.last_response is client.last_response
+        assert TweepySink(lambda: None).post("hello") is None
+
+    def test_webhook_sink(self, server):
+        sink = WebhookSink(f"{server.url}/hook", headers={"X-Token": "abc"})
+        try:
+            assert sink.post("hello", callsign="WB4BOR") == "1"
+        finally:
+            sink.close()
+
+        path, headers, body = server.requests[0]
+        assert path == "/hook"
+        assert headers["X-Token"] == "abc"
+        assert body == {"callsign": "WB4BOR", "text": "hello"}
+
+    def test_webhook_error(self, server):
+        server.status = 500
+        sink = WebhookSink(server.url)
+        with pytest.raises(requests.HTTPError):
+            sink.post("hello")
+        sink.close()
+
+    def test_mastodon_sink(self, server):
+        sink = MastodonSink(f"{server.url}/", "secret")
+        try:
+            assert sink.post("hello #aprs", callsign="WB4BOR") == "1"
+        finally:
+            sink.close()
+
+        path, headers, body = server.requests[0]
+        assert path == "/api/v1/statuses"
+        assert headers["Authorization"] == "Bearer secret"
+        assert body == {"status": "hello #aprs"}
+
+    def test_file_sink(self, tmp_path):
+        path = tmp_path / "out.jsonl"
+        sink = FileSink(str(path))
+        assert sink.post("one", callsign="WB4BOR") == 1
+        assert sink.post("two") == 2
+
+        records = [json.loads(line) for line in path.read_text().splitlines()]
+        assert [(r["callsign"], r["text"]) for r in records] == [("WB4BOR", "one"), (None, "two")]
+
+
+class TestSinkWorker:
+    def test_slow_sink_does_not_delay_others(self, tmp_path):
+        slow = SinkWorker(SlowSink(), concurrency=1)
+        fast = SinkWorker(FileSink(str(tmp_path / "out.jsonl")))
+        dispatcher = SinkDispatcher([slow, fast])
+        try:
+            start = time.monotonic()
+            slow_future, fast_future = dispatcher.publish("hello", "WB4BOR")
+            assert fast_future.result(timeout=2) == 1
+            assert time.monotonic() - start < 1
+            assert not slow_future.done()
+        finally:
+            slow.sink.release.set()
+        assert slow_future.result(timeout=2) == "slow"
+        dispatcher.close()
+
+    def test_max_pending_drops(self):
+        worker = SinkWorker(SlowSink(), concurrency=1, max_pending=2)
+        try:
+            futures = [worker.submit(f"msg {i}") for i in range(4)]
+            assert futures[2:] == [None, None]
+            assert worker.stats()["dropped"] == 2
+        finally:
+            worker.sink.release.set()
+        for future in futures[:2]:
+            future.result(timeout=2)
+        assert worker.stats() == {"sent": 2, "failed": 0, "dropped": 2, "pending": 0}
+        worker.close()
+
+    def test_breaker_pauses_failing_sink(self):
+        sink = FailingSink()
+        worker = SinkWorker(sink, concurrency=1, failure_threshold=3, cooldown=60)
+        for _ in range(3):
+            assert worker.submit("hello").result(timeout=2) is None
+
+        assert worker.submit("hello") is None
+        assert sink.calls == 3
+        assert worker.stats()["failed"] == 3
+        assert worker.stats()["dropped"] == 1
+
+        worker._paused_until = 0
+        worker.submit("hello").result(timeout=2)
+        assert sink.calls == 4
+        worker.close()
+
+    def test_submit_after_close(self, tmp_path):
+        worker = SinkWorker(FileSink(str(tmp_path / "out.jsonl")))
+        worker.close()
+        assert worker.submit("hello") is None
+        assert worker.stats()["pending"] == 0
+
+    def test_empty_dispatcher(self):
+        dispatcher = SinkDispatcher()
+        assert not dispatcher
+        assert dispatcher.publish("hello") == []
@@ -0,0 +1,76 @@
+"""Smoke tests for the soak harness in `benchmarks/soak.py`."""
+
+import importlib.util
+import io
+import os
+import tracemalloc
+
+import pytest
+import tweepy
+
+SOAK_PATH = os.path.join(os.path.dirname(__file__), os.pardir, "benchmarks", "soak.py")
+
+
+@pytest.fixture(scope="module")
+def soak():
+    spec = importlib.util.spec_from_file_location("soak", SOAK_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture
+def plugin(soak):
+    names = soak.configure()
+    plugin = soak.create_plugin(soak.FakeAPI(remember=10))
+    yield plugin
+    plugin.stop_threads()
+    for name in names:
+        soak.CONF.clear_override(name, group="aprsd_twitter_plugin")
+
+
+class TestSoak:
+    def test_fake_api(self, soak):
+        api = soak.FakeAPI(remember=2)
+        assert api.update_status("one").id == 1
+        with pytest.raises(tweepy.Forbidden):
+            api.update_status("one")
+        with pytest.raises(tweepy.TwitterServerError):
+            api.update_status("please fail")
+        api.update_status("two")
+        api.update_status("three")
+        # 'one' was forgotten
+        assert api.update_status("one").id == 4
+
+    @pytest.mark.parametrize("mix", ["authorized", "unauthorized", "duplicate", "error"])
+    def test_traffic(self, soak, mix):
+        source = soak.traffic(mix)
+        sample = [next(source) for _ in range(50)]
+        if mix == "unauthorized":
+            assert {call for call, _ in sample} == {"N0CALL"}
+        elif mix == "error":
+            assert any("fail" in text for _, text in sample)
+        elif mix == "duplicate":
+            texts = [text for _, text in sample]
+            assert len(set(texts)) < len(texts)
+
+    def test_check(self, soak):
+        base = {"memory": 100 * 1024, "p99": 0.001}
+        assert soak.check([base, dict(base)], 64, 1.5) == []
+        grown = {"memory": 200 * 1024, "p99": 0.003}
+        failures = soak.check([base, grown], 64, 1.5)
+        assert len(failures) == 2
+        assert failures[0].startswith("memory grew 100.0KB")
+        assert soak.check([base], 64, 1.5)
+
+    def test_short_soak(self, soak, plugin):
+        out = io.StringIO()
+        tracemalloc.start()
+        try:
+            samples = soak.soak(plugin, 600, 200, "mixed", out=out)
+        finally:
+            tracemalloc.stop()
+        assert [s["packets"] for s in samples] == [200, 400, 600]
+        assert all(s["p50"] <= s["p99"] <= s["max"] for s in samples)
+        assert len(out.getvalue().splitlines()) == 3
+        assert plugin.stats.read()["sent"] > 0
@@ -0,0 +1,104 @@
+"""Tests for the `aprsd_twitter_plugin.stats` module and the stats CLI."""
+
+import json
+import sys
+import threading
+
+import pytest
+
+from aprsd_twitter_plugin import cli, stats
+
+
+@pytest.fixture
+def stats_path(tmp_path):
+    return str(tmp_path / "twitter_stats.mmap")
+
+
+class TestStatsFile:
+    def test_roundtrip(self, stats_path):
+        writer = stats.StatsFile(stats_path)
+        writer.incr("sent")
+        writer.incr("sent")
+        writer.incr("auth")
+        writer.set("queue_depth", 3)
+        writer.error("auth: 401 Unauthorized")
+
+        reader = stats.StatsReader(stats_path)
+        current = reader.read()
+        assert current["sent"] == 2
+        assert current["auth"] == 1
+        assert current["failed"] == 0
+        assert current["queue_depth"] == 3
+        assert current["rate_limit_remaining"] == -1
+        assert current["last_error"] == "auth: 401 Unauthorized"
+        assert current["last_error_time"] > 0
+
+        # the reader sees later updates without reopening
+        writer.incr("sent")
+        assert reader.read()["sent"] == 3
+        reader.close()
+        writer.close()
+
+    def test_anonymous(self):
+        writer = stats.StatsFile()
+        writer.incr("blocked")
+        assert writer.read()["blocked"] == 1
+
+    def test_long_error_truncated(self):
+        writer = stats.StatsFile()
+        writer.error("x" * 500)
+        assert writer.read()["last_error"] == "x" * stats.ERROR_TEXT_SIZE
+
+    def test_concurrent_increments(self):
+        # switch threads as often as possible to provoke interleaving
+        old = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        writer = stats.StatsFile()
+        seen = []
+
+        def work():
+            published = []
+            seen.append(published)
+            for _ in range(2000):
+                writer.incr("sent")
+                published.append(writer.read()["sent"])
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(old)
+        # the published count never goes backwards
+        assert writer.read()["sent"] == 8000
+        for published in seen:
+            assert published == sorted(published)
+
+    def test_not_a_stats_file(self, tmp_path):
+        path = tmp_path / "junk"
+        path.write_bytes(b"\0" * stats.SIZE)
+        with pytest.raises(ValueError):
+            stats.StatsReader(str(path)).read()
+
+
+class TestStatsCli:
+    def test_stats_json(self, stats_path, capsys):
+        writer = stats.StatsFile(stats_path)
+        writer.incr("sent")
+        assert cli.stats_cmd(stats_path, as_json=True) == 0
+        assert json.loads(capsys.readouterr().out)["sent"] == 1
+
+    def test_stats_text(self, stats_path, capsys):
+        writer = stats.StatsFile(stats_path)
+        writer.incr("failed")
+        writer.error("transient: 503")
+        assert cli.stats_cmd(stats_path) == 0
+        out = capsys.readouterr().out
+        assert "failed         1" in out
+        assert "last error    transient: 503" in out
+
+    def test_missing_file(self, tmp_path, capsys):
+        assert cli.stats_cmd(str(tmp_path / "nope")) == 1
+        assert "can't read stats file" in capsys.readouterr().err
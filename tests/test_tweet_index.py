@@ -0,0 +1,52 @@
+"""Tests for the `aprsd_twitter_plugin.tweet_index` module."""
+
+from aprsd_twitter_plugin.tweet_index import TweetIndex
+
+
+class TestTweetIndex:
+    def test_handles_per_callsign(self):
+        index = TweetIndex()
+        assert index.add("WB4BOR", 100, "one") == 1
+        assert index.add("WB4BOR", 101, "two") == 2
+        assert index.add("WB4BOR-1", 102, "three") == 1
+        assert index.get("WB4BOR", 2)["id"] == 101
+        assert index.get("WB4BOR", 3) is None
+        handle, entry = index.last("WB4BOR-1")
+        assert handle == 1
+        assert entry["text"] == "three"
+
+    def test_bounded(self):
+        index = TweetIndex(size=2)
+        for i in range(5):
+            index.add("WB4BOR", i, str(i))
+        assert index.get("WB4BOR", 4)["id"] == 3
+        assert index.get("WB4BOR", 3) is None
+        # handles are never reused
+        assert index.add("WB4BOR", 5, "5") == 6
+
+    def test_remove(self):
+        index = TweetIndex()
+        index.add("WB4BOR", 100, "one")
+        assert index.remove("WB4BOR", 1)["id"] == 100
+        assert index.remove("WB4BOR", 1) is None
+        assert index.last("WB4BOR") == (None, None)
+
+    def test_persistence(self, tmp_path):
+        path = str(tmp_path / "index.json")
+        index = TweetIndex(path=path)
+        index.add("WB4BOR", 100, "one")
+        index.add("WB4BOR", 101, "two")
+        index.remove("WB4BOR", 1)
+
+        reloaded = TweetIndex(path=path)
+        assert reloaded.get("WB4BOR", 1) is None
+        assert reloaded.get("WB4BOR", 2)["id"] == 101
+        assert reloaded.add("WB4BOR", 102, "three") == 3
+
+    def test_malformed_file(self, tmp_path):
+        for content in ["[]", '{"WB4BOR": {}}', '{"WB4BOR": {"next": 1, "tweets": 3}}', "{"]:
+            path = tmp_path / "index.json"
+            path.write_text(content)
+            index = TweetIndex(path=str(path))
+            assert index.last("WB4BOR") == (None, None)
+            assert index.add("WB4BOR", 1, "one") == 1
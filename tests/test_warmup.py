@@ -0,0 +1,116 @@
+"""Tests for the `aprsd_twitter_plugin.warmup` module."""
+
+import socket
+import time
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import requests
+
+from aprsd_twitter_plugin.warmup import (
+    ConnectionWarmer,
+    DNSCache,
+    DNSCacheAdapter,
+    mount_dns_cache,
+)
+
+
+class TestDNSCache:
+    def test_caches_registered_hosts(self):
+        resolver = MagicMock(return_value=["addr"])
+        cache = DNSCache(ttl=60)
+        cache._getaddrinfo = resolver
+        cache.add_host("api.twitter.com")
+
+        assert cache.resolve("api.twitter.com") == ["addr"]
+        assert cache.getaddrinfo("api.twitter.com", 443, 0, socket.SOCK_STREAM) == ["addr"]
+        assert resolver.call_count == 1
+
+        cache.getaddrinfo("example.com", 443)
+        cache.getaddrinfo("example.com", 443)
+        assert resolver.call_count == 3
+
+    def test_ttl_expiry(self):
+        resolver = MagicMock(return_value=["addr"])
+        cache = DNSCache(ttl=0)
+        cache._getaddrinfo = resolver
+        cache.add_host("api.twitter.com")
+        cache.resolve("api.twitter.com")
+        cache.resolve("api.twitter.com")
+        assert resolver.call_count == 2
+
+    def test_adapter_connects_to_cached_address(self):
+        server = socket.create_server(("127.0.0.1", 0))
+        port = server.getsockname()[1]
+        resolver = MagicMock(
+            return_value=[(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", port))],
+        )
+        cache = DNSCache()
+        cache._getaddrinfo = resolver
+        cache.add_host("api.twitter.com")
+        original = socket.getaddrinfo
+
+        session = requests.Session()
+        mount_dns_cache(SimpleNamespace(session=session), cache)
+        adapter = session.get_adapter("https://api.twitter.com/1.1/statuses/update.json")
+        assert isinstance(adapter, DNSCacheAdapter)
+        assert not isinstance(session.get_adapter("https://example.com/"), DNSCacheAdapter)
+
+        pool = adapter.get_connection_with_tls_context(
+            requests.Request("GET", f"https://api.twitter.com:{port}/").prepare(),
+            verify=True,
+        )
+        conn = pool._new_conn()
+        try:
+            sock = conn._new_conn()
+            assert sock.getpeername() == ("127.0.0.1", port)
+            sock.close()
+        finally:
+            server.close()
+        # TLS still verifies the real host name, nothing global is patched
+        assert conn.host == "api.twitter.com"
+        assert socket.getaddrinfo is original
+        resolver.assert_called_once_with("api.twitter.com", port, 0, socket.SOCK_STREAM, 0, 0)
+
+
+class TestConnectionWarmer:
+    def test_probe_uses_client_session(self):
+        client = MagicMock()
+        dns = MagicMock()
+        warmer = ConnectionWarmer(lambda: client, dns_cache=dns)
+        assert warmer.probe() is True
+        assert warmer.warm
+        dns.resolve.assert_called_once_with("api.twitter.com")
+        client.session.head.assert_called_once_with("https://api.twitter.com/", timeout=10)
+
+    def test_probe_never_raises(self):
+        def broken():
+            raise OSError("network is unreachable")
+
+        warmer = ConnectionWarmer(broken)
+        assert warmer.probe() is False
+        assert not warmer.warm
+        assert ConnectionWarmer(lambda: None).probe() is False
+
+    def test_only_probes_when_idle(self):
+        client = MagicMock()
+        warmer = ConnectionWarmer(lambda: client, interval=60)
+        with patch.object(warmer._wake, "wait") as wait:
+            warmer.loop()
+            warmer.touch()
+            warmer.loop()
+        assert client.session.head.call_count == 1
+        assert 59 < wait.call_args[0][0] <= 60
+
+    def test_startup_does_not_block(self):
+        def slow_client():
+            time.sleep(0.5)
+            raise OSError("no network")
+
+        warmer = ConnectionWarmer(slow_client, interval=60)
+        start = time.monotonic()
+        warmer.start()
+        assert time.monotonic() - start < 0.2
+        warmer.stop()
+        warmer.join(5)
+        assert not warmer.is_alive()